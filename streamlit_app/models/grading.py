@@ -0,0 +1,40 @@
+from typing import List
+
+from pydantic import BaseModel
+
+# Grading outcomes
+PASSED = "passed"
+FAILED = "failed"
+ERROR = "error"
+TIMEOUT = "timeout"
+MEMORY_EXCEEDED = "memory_exceeded"
+
+
+class TestCaseResult(BaseModel):
+    """Outcome of a single test function"""
+
+    nodeid: str
+    outcome: str
+    duration: float = 0.0
+    message: str = ""
+    output: str = ""
+
+    @property
+    def name(self) -> str:
+        return self.nodeid.split("::")[-1]
+
+
+class GradingResult(BaseModel):
+    """Outcome of grading one submission"""
+
+    status: str
+    messages: List[str] = []
+    tests: List[TestCaseResult] = []
+
+    @property
+    def success(self) -> bool:
+        return self.status == PASSED
+
+    @property
+    def duration(self) -> float:
+        return sum(test.duration for test in self.tests)
@@ -3,21 +3,21 @@ import streamlit as st
 # Hide default Streamlit navigation
 
 from utils.manage_account import register_user
-from utils.firebase import (
+from utils.storage import (
     authenticate_user,
     create_user,
-    initialize_firebase,
-    get_user_by_id,
+    initialize_storage,
 )
+from utils.user_cache import get_user_profile, invalidate_user
 
 # # Initialize the session state
 # if "user_id" not in st.session_state:
 #     st.session_state.user_id = None
 
-# Initialize Firebase
-firebase_initialized = initialize_firebase()
-if not firebase_initialized:
-    st.error("Firebase initialization failed. Please check your credentials.")
+# Initialize the storage backend (Firebase by default)
+storage_initialized = initialize_storage()
+if not storage_initialized:
+    st.error("Storage initialization failed. Please check your credentials.")
 
 
 # Function to log in a user
@@ -28,6 +28,8 @@ def login_user(email, password):
     success, message, user = authenticate_user(email, password)
 
     if success and user:
+        # Start from a fresh profile after logging in
+        invalidate_user(user.get("uid"))
         st.session_state.user_id = user.get("uid")
         st.success(message)
         # Refresh the page to show the logged-in state
@@ -44,7 +46,8 @@ def is_authenticated():
 def get_current_user():
     """Get the current authenticated user."""
     if is_authenticated():
-        user_data = get_user_by_id(st.session_state.user_id)
+        # Cached, and including completions still waiting to be written
+        user_data = get_user_profile(st.session_state.user_id)
         # Store in session state for easy access across pages
         st.session_state.user = user_data
         return user_data
@@ -53,6 +56,7 @@ def get_current_user():
 
 def logout():
     """Log out the current user."""
+    invalidate_user(st.session_state.get("user_id"))
     st.session_state.user_id = None
     st.session_state.user = None
     # Clear any module or exercise selections
@@ -63,7 +67,7 @@ def logout():
 # Display user profile when logged in
 def display_user_profile():
     """Display user profile information when logged in."""
-    user = get_user_by_id(st.session_state.user_id)
+    user = get_user_profile(st.session_state.user_id)
 
     if not user:
         st.error("Error loading user profile. Please log out and log in again.")
@@ -5,6 +5,7 @@ Exercises page for Streamlit application - loads exercises from local files.
 import streamlit as st
 import sys
 import os
+import time
 import markdown
 from pathlib import Path
 import io
@@ -21,19 +22,44 @@ from utils.course_loader import (
     get_test_file_for_exercise,
     mark_exercise_completed,
 )
-from utils.exercise_runner import test_exercise
-from utils.firebase import get_user_by_id  # Still need this for user data
+from utils.grading_queue import get_grading_queue
+from utils.render_cache import render_cached
+from utils.code_highlight import HIGHLIGHT_VERSION, highlight_code_blocks, highlight_css
+from models.grading import TIMEOUT, MEMORY_EXCEEDED, ERROR
+from utils.storage import get_user_by_id  # Still need this for user data
+
+# Seconds between reruns while a submission is being graded
+GRADING_POLL_INTERVAL = 0.5
+
+TEST_OUTCOME_ICONS = {"passed": "✅", "failed": "❌", "error": "⚠️", "skipped": "⏭️"}
 
 # Initialize the session state if not already done
 if "user_id" not in st.session_state:
     st.session_state.user_id = None
 
 
+# Code blocks are highlighted (and cached) before the conversion; fenced_code
+# only handles them when Pygments is not installed
+MARKDOWN_EXTENSIONS = ["fenced_code", "tables"]
+
+
+def _markdown_to_html(md_content):
+    return markdown.markdown(
+        highlight_code_blocks(md_content), extensions=MARKDOWN_EXTENSIONS
+    )
+
+
 def render_markdown(md_content):
     """Render markdown content in Streamlit"""
-    html = markdown.markdown(
-        md_content, extensions=["fenced_code", "codehilite", "tables"]
+    # Converted once per description and shared by every session
+    html = render_cached(
+        md_content,
+        _markdown_to_html,
+        "markdown",
+        f"{markdown.__version__}/{HIGHLIGHT_VERSION}",
+        MARKDOWN_EXTENSIONS,
     )
+    st.markdown(highlight_css(), unsafe_allow_html=True)
     st.markdown(html, unsafe_allow_html=True)
 
 
@@ -95,31 +121,109 @@ def display_exercise(exercise_id):
             st.error(f"Failed to get test file: {test_message}")
             return
 
-        # Run tests
-        success, messages = test_exercise(exercise_content, test_content)
+        # Queue the tests; the result is picked up on a later rerun
+        queued, message, job_id = get_grading_queue().submit(
+            exercise_content,
+            test_content,
+            exercise_data.get("limits"),
+            exercise_data.get("runner"),
+        )
+        if not queued:
+            st.error(message)
+            return
+
+        st.session_state.grading_job = {"id": job_id, "exercise_id": exercise_id}
 
-        # Display results
-        if success:
-            st.success("✅ All tests passed! Great job!")
+    display_grading_status(exercise_id)
 
-            # Mark exercise as completed
-            mark_success = mark_exercise_completed(
-                st.session_state.user_id, exercise_id
-            )
-            if mark_success:
-                st.success("Exercise marked as completed in your profile!")
 
-            # Show detailed test results
-            # with st.expander("View detailed test results"):
-            #     for message in messages:
-            #         st.write(message)
+def display_grading_status(exercise_id):
+    """Show the state of the current grading job, polling until it finishes"""
+    job = st.session_state.get("grading_job")
+    if not job or job["exercise_id"] != exercise_id:
+        return
+
+    grading_queue = get_grading_queue()
+    status = grading_queue.poll(job["id"])
+
+    if status["state"] in ("queued", "running"):
+        if status["state"] == "queued":
+            st.info(
+                f"⏳ Waiting for a free grader "
+                f"({status.get('position', 0)} submissions ahead of yours)..."
+            )
         else:
-            st.error("❌ Some tests failed. Check the details and try again.")
+            st.info(f"⚙️ Running your tests... ({status['elapsed']:.0f}s)")
+
+        if st.button("Cancel", key="cancel_grading"):
+            grading_queue.cancel(job["id"])
+            st.session_state.grading_job = None
+            st.rerun()
+
+        # Check again shortly without holding the script thread on pytest
+        time.sleep(GRADING_POLL_INTERVAL)
+        st.rerun()
+
+    st.session_state.grading_job = None
+
+    if status["state"] == "cancelled":
+        st.warning("Grading cancelled.")
+        return
+    if status["state"] != "done":
+        st.error(
+            f"Grading failed: {status.get('error', 'job not found')}. Please try again."
+        )
+        return
+
+    result = status["result"]
+
+    # Display results
+    if result.status == TIMEOUT:
+        st.error(
+            "⏱️ Your code took too long to run and was stopped. "
+            "Check for infinite loops and try again."
+        )
+    elif result.status == MEMORY_EXCEEDED:
+        st.error(
+            "💾 Your code used too much memory and was stopped. "
+            "Check for very large lists or unbounded recursion."
+        )
+    elif result.status == ERROR:
+        st.error("⚠️ The grader ran into a problem. Please try again.")
+    elif result.success:
+        st.success("✅ All tests passed! Great job!")
+
+        # Mark exercise as completed
+        mark_success = mark_exercise_completed(st.session_state.user_id, exercise_id)
+        if mark_success:
+            st.success("Exercise marked as completed in your profile!")
+
+        # Show detailed test results
+        with st.expander("View detailed test results"):
+            display_test_results(result)
+    else:
+        st.error("❌ Some tests failed. Check the details and try again.")
+
+        # Show detailed test results
+        st.subheader("Test Results")
+        display_test_results(result)
+
+
+def display_test_results(result):
+    """Show the outcome of each test in a grading result"""
+    if not result.tests:
+        for message in result.messages:
+            st.text(message)
+        return
 
-            # Show detailed test results
-            # st.subheader("Test Results")
-            # for message in messages:
-            #     st.text(message)
+    for test in result.tests:
+        icon = TEST_OUTCOME_ICONS.get(test.outcome, "❔")
+        st.markdown(f"{icon} `{test.name}` ({test.duration * 1000:.0f} ms)")
+        if test.message:
+            st.code(test.message, language=None)
+        if test.output and test.outcome != "passed":
+            with st.expander(f"Output of {test.name}"):
+                st.text(test.output)
 
 
 def display_exercise_list(module_id):
@@ -9,7 +9,8 @@ import os
 # Add the project root to the Python path
 # sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
-from utils.firebase import authenticate_user
+from utils.storage import authenticate_user
+from utils.user_cache import invalidate_user
 
 # Initialize the session state if not already done
 if "user_id" not in st.session_state:
@@ -27,6 +28,8 @@ def login_user(email, password):
     success, message, user = authenticate_user(email, password)
 
     if success and user:
+        # Start from a fresh profile after logging in
+        invalidate_user(user.get("uid"))
         st.session_state.user_id = user.get("uid")
         st.success(message)
         # Redirect to the main page
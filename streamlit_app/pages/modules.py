@@ -17,25 +17,68 @@ from utils.course_loader import (
     get_module_by_id,
     mark_module_completed,
 )
-from utils.markdown_converter import load_and_convert_markdown
-from utils.firebase import get_user_by_id  # Still need this for user data
+from utils.markdown_converter import convert_markdown_cached, module_sections
+from utils.code_highlight import highlight_css
+from utils.storage import get_user_by_id  # Still need this for user data
 
 # Initialize the session state if not already done
 if "user_id" not in st.session_state:
     st.session_state.user_id = None
 
 
-def render_markdown(filename):
-    """Render markdown content in Streamlit"""
+def render_markdown(content):
+    """Render markdown content (text or a content handle) in Streamlit"""
 
-    content = load_and_convert_markdown(filename)
-    # TODO: Check supported extensions
-    # html = markdown.markdown(
-    #     md_content, extensions=["fenced_code", "codehilite", "tables"]
-    # )
+    # Converted once per content and shared by every session
+    content = convert_markdown_cached(content)
+    st.markdown(highlight_css(), unsafe_allow_html=True)
     st.markdown(content, unsafe_allow_html=True)
 
 
+def _select_section(module_id, index):
+    st.session_state[f"section_{module_id}"] = index
+
+
+def display_module_section(module_id, sections):
+    """Display one section of a module, with the table of contents in the sidebar"""
+    key = f"section_{module_id}"
+    if st.session_state.get(key, 0) >= len(sections):
+        # The module got shorter since the section was selected
+        st.session_state[key] = 0
+
+    with st.sidebar:
+        st.subheader("Contents")
+        index = st.radio(
+            "Contents",
+            range(len(sections)),
+            format_func=lambda i: (
+                "\u2003" * max(sections[i]["level"] - 1, 0)
+                + (sections[i]["title"] or "Introduction")
+            ),
+            key=key,
+            label_visibility="collapsed",
+        )
+
+    # Only the selected section is converted and sent to the browser
+    render_markdown(sections[index]["markdown"])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if index > 0:
+            st.button(
+                f"← {sections[index - 1]['title'] or 'Introduction'}",
+                on_click=_select_section,
+                args=(module_id, index - 1),
+            )
+    with col2:
+        if index < len(sections) - 1:
+            st.button(
+                f"{sections[index + 1]['title']} →",
+                on_click=_select_section,
+                args=(module_id, index + 1),
+            )
+
+
 def load_module_content(module_id):
     """Load module content from local file system"""
     module = get_module_by_id(module_id)
@@ -49,10 +92,14 @@ def load_module_content(module_id):
     # Display module content
     st.title(module.get("title", "Module"))
 
-    # Display the module content as markdown
-
-    render_markdown(module.get("filename", "No content available"))
-    # render_markdown(module.get("content", "No content available"))
+    # The content comes from the course bundle or the course tree, so it
+    # is rendered from the module data rather than re-read from a file.
+    # It is a lazy handle, read only when the render cache misses.
+    sections = module_sections(module.get("content", ""))
+    if sections:
+        display_module_section(module_id, sections)
+    else:
+        st.info("No content available")
 
     # Mark as completed button
     if st.button("Mark as Completed"):
@@ -0,0 +1,153 @@
+"""
+Syntax highlighting of fenced code blocks.
+
+Lexing with Pygments is the most expensive part of rendering code-heavy
+lessons, so each block is highlighted once per (language, code) and kept in
+the shared render cache. Module and exercise pages both run their markdown
+through highlight_code_blocks, and tools/build_course_bundle.py can
+highlight every block of the course ahead of time into the cache's disk
+tier. Code in a language Pygments does not know is shown as plain text.
+"""
+
+import html
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    import pygments
+    from pygments import highlight
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+except ImportError:  # without Pygments, fences are left to the markdown renderer
+    pygments = None
+
+from utils.render_cache import render_cached
+
+# Bump whenever a change to the highlighting can change its output
+HIGHLIGHT_VERSION = 1
+
+# A fenced block at the start of a line, closed by the same fence. Fences
+# inside admonitions (quoted by the converter) are left to the renderer.
+_FENCED_BLOCK = re.compile(
+    r"^(?P<fence>`{3,}|~{3,})[ \t]*(?P<language>[\w+#.-]*)[^\n]*\n"
+    r"(?P<code>.*?)\n?^(?P=fence)[ \t]*$",
+    re.MULTILINE | re.DOTALL,
+)
+
+
+@lru_cache(maxsize=1)
+def _formatter():
+    # The block is wrapped in <pre> below: an HTML block starting with <pre>
+    # may contain blank lines in both Streamlit's and Python-Markdown's parser
+    return HtmlFormatter(nowrap=True)
+
+
+@lru_cache(maxsize=64)
+def _lexer(language: str):
+    try:
+        return get_lexer_by_name(language)
+    except ClassNotFound:
+        return None
+
+
+def _highlight(code: str, language: str) -> str:
+    lexer = _lexer(language.lower()) if language else None
+    if lexer is None:
+        body = html.escape(code)
+    else:
+        body = highlight(code, lexer, _formatter())
+    return f'<pre class="highlight"><code>{body.rstrip()}</code></pre>'
+
+
+def highlight_code(code: str, language: str) -> str:
+    """
+    Highlight one code block through the shared render cache.
+
+    Args:
+        code (str): Source code
+        language (str): Language name or alias, "" if unknown
+
+    Returns:
+        str: HTML of the block, escaped plain code for unknown languages
+    """
+    return render_cached(
+        code,
+        lambda text: _highlight(text, language),
+        "pygments",
+        f"{HIGHLIGHT_VERSION}/{pygments.__version__}",
+        [language.lower()],
+    )
+
+
+def highlight_code_blocks(content: str) -> str:
+    """
+    Replace the fenced code blocks of markdown with highlighted HTML.
+
+    Args:
+        content (str): Markdown text
+
+    Returns:
+        str: Markdown with highlighted blocks, unchanged if Pygments is not
+        installed
+    """
+    if pygments is None or "```" not in content and "~~~" not in content:
+        return content
+    # Blank lines around the HTML keep it a block of its own
+    return _FENCED_BLOCK.sub(
+        lambda match: "\n"
+        + highlight_code(match.group("code"), match.group("language"))
+        + "\n",
+        content,
+    )
+
+
+@lru_cache(maxsize=1)
+def highlight_css() -> str:
+    """
+    Get the stylesheet for highlighted blocks.
+
+    Returns:
+        str: A <style> element, "" if Pygments is not installed
+    """
+    if pygments is None:
+        return ""
+    return f"<style>{HtmlFormatter().get_style_defs('.highlight')}</style>"
+
+
+def precompute_highlighting(course_dir: Path) -> int:
+    """
+    Highlight every code block of a course into the render cache.
+
+    Covers the markdown files of modules and exercises and the exercise
+    descriptions in their metadata. Only useful with the cache's disk tier
+    (RENDER_CACHE_DIR), which the app then reads instead of lexing.
+
+    Args:
+        course_dir (Path): Directory with modules/ and exercises/
+
+    Returns:
+        int: Number of code blocks found
+    """
+    if pygments is None:
+        return 0
+
+    sources = [path.read_text(encoding="utf-8") for path in course_dir.rglob("*.md")]
+    for metadata_file in course_dir.glob("exercises/*/metadata.json"):
+        try:
+            with open(metadata_file, "r", encoding="utf-8") as f:
+                description = json.load(f).get("description")
+        except (OSError, ValueError) as e:
+            print(f"Error reading {metadata_file}: {str(e)}")
+            continue
+        if description:
+            sources.append(description)
+
+    blocks = 0
+    for source in sources:
+        for match in _FENCED_BLOCK.finditer(source):
+            highlight_code(match.group("code"), match.group("language"))
+            blocks += 1
+    return blocks
@@ -0,0 +1,220 @@
+"""
+Compiled course bundle.
+
+tools/build_course_bundle.py compiles the whole course/ tree into one file,
+so a deploy ships (and atomically swaps) a single artifact and the app opens
+one file instead of hundreds of small ones. Layout:
+
+    8 bytes   magic b"PYCOURSE"
+    4 bytes   format version, big-endian
+    8 bytes   header length, big-endian
+    header    UTF-8 JSON: metadata of every module and exercise, and an
+              offset table {"<kind>/<id>/<file>": [offset, length]}
+    data      the files' contents back to back, offsets relative to here
+
+The bundle is memory-mapped. Metadata is parsed once when it is opened;
+file contents are only touched when a section is read through the offset
+table.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.course_index import CourseIndex, index_entries
+
+BUNDLE_MAGIC = b"PYCOURSE"
+BUNDLE_FORMAT = 1
+_PREAMBLE = struct.Struct(">8sIQ")
+
+# Directory names of the two entry kinds under course/
+KINDS = {"module": "modules", "exercise": "exercises"}
+
+SKIPPED_NAMES = {"__pycache__", ".DS_Store"}
+
+
+class BundleError(Exception):
+    """Raised when a bundle file is missing, truncated or of another format."""
+
+
+def _entry_files(entry_dir: Path) -> List[Path]:
+    """Every regular file under an entry directory, in a stable order."""
+    files = []
+    for root, dirs, names in os.walk(entry_dir):
+        dirs[:] = sorted(
+            d for d in dirs if d not in SKIPPED_NAMES and not d.startswith(".")
+        )
+        for name in sorted(names):
+            if name in SKIPPED_NAMES or name.startswith("."):
+                continue
+            files.append(Path(root) / name)
+    return files
+
+
+def build_bundle(course_dir: Path, output: Path) -> Dict[str, Any]:
+    """
+    Compile a course directory into a bundle file.
+
+    The bundle is written to a temporary file and moved into place, so a
+    running app never sees a half-written bundle.
+
+    Args:
+        course_dir (Path): Directory with modules/ and exercises/
+        output (Path): Bundle file to write
+
+    Returns:
+        Dict[str, Any]: The bundle header
+    """
+    index = CourseIndex(course_dir / KINDS["module"], course_dir / KINDS["exercise"])
+    entries = {"module": index.modules(), "exercise": index.exercises()}
+
+    files: Dict[str, List[int]] = {}
+    chunks = []
+    offset = 0
+    digest = hashlib.sha256()
+    for kind, metadata_list in entries.items():
+        for metadata in metadata_list:
+            entry_dir = course_dir / KINDS[kind] / metadata["id"]
+            for path in _entry_files(entry_dir):
+                data = path.read_bytes()
+                key = (
+                    f"{kind}/{metadata['id']}/{path.relative_to(entry_dir).as_posix()}"
+                )
+                files[key] = [offset, len(data)]
+                chunks.append(data)
+                offset += len(data)
+                digest.update(key.encode("utf-8") + b"\0" + data)
+
+    header = {
+        "format": BUNDLE_FORMAT,
+        "built": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "contentHash": digest.hexdigest(),
+        "modules": entries["module"],
+        "exercises": entries["exercise"],
+        "files": files,
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=output.parent, prefix=".bundle-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREAMBLE.pack(BUNDLE_MAGIC, BUNDLE_FORMAT, len(header_bytes)))
+            f.write(header_bytes)
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(temp_path, output)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return header
+
+
+class CourseBundle:
+    """
+    Read-only view of a bundle file.
+
+    Offers the same lookups as CourseIndex, so course_loader can serve
+    from either, plus read() for the entries' files.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self.identity = self._identity(os.fstat(f.fileno()))
+            if self.identity[2] < _PREAMBLE.size:
+                raise BundleError(f"{self.path} is truncated")
+            # The map stays valid after the file is closed, and keeps the
+            # opened version readable even after a deploy replaces the file
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_length = _PREAMBLE.unpack_from(self._map, 0)
+        if magic != BUNDLE_MAGIC:
+            raise BundleError(f"{self.path} is not a course bundle")
+        if version != BUNDLE_FORMAT:
+            raise BundleError(
+                f"{self.path} has format {version}, expected {BUNDLE_FORMAT}"
+            )
+        self.data_offset = _PREAMBLE.size + header_length
+        if self.data_offset > len(self._map):
+            raise BundleError(f"{self.path} is truncated")
+        header = json.loads(self._map[_PREAMBLE.size : self.data_offset])
+
+        self.built = header.get("built")
+        self.content_hash = header.get("contentHash")
+        self._files: Dict[str, List[int]] = header["files"]
+        self._modules, self._modules_by_id, _ = index_entries(header["modules"])
+        self._exercises, self._exercises_by_id, self._exercises_by_module = (
+            index_entries(header["exercises"], group_by="moduleId")
+        )
+        self._reads = 0
+
+    @staticmethod
+    def _identity(stat: os.stat_result) -> tuple:
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def is_current(self) -> bool:
+        """Whether the bundle file on disk is still the one that was opened."""
+        try:
+            return self._identity(os.stat(self.path)) == self.identity
+        except OSError:
+            return False
+
+    def modules(self) -> List[Dict[str, Any]]:
+        return [dict(metadata) for metadata in self._modules]
+
+    def module(self, module_id: str) -> Optional[Dict[str, Any]]:
+        metadata = self._modules_by_id.get(module_id)
+        return dict(metadata) if metadata is not None else None
+
+    def exercises(self) -> List[Dict[str, Any]]:
+        return [dict(metadata) for metadata in self._exercises]
+
+    def exercises_for_module(self, module_id: str) -> List[Dict[str, Any]]:
+        return [
+            dict(metadata) for metadata in self._exercises_by_module.get(module_id, [])
+        ]
+
+    def exercise(self, exercise_id: str) -> Optional[Dict[str, Any]]:
+        metadata = self._exercises_by_id.get(exercise_id)
+        return dict(metadata) if metadata is not None else None
+
+    @staticmethod
+    def file_key(kind: str, entry_id: str, filename: str) -> str:
+        """Offset table key of a module's or exercise's file."""
+        return f"{kind}/{entry_id}/{filename}"
+
+    def view(self, key: str) -> Optional[memoryview]:
+        """
+        Get one file's contents without copying them.
+
+        Args:
+            key (str): Offset table key, see file_key
+
+        Returns:
+            Optional[memoryview]: File contents, None if the bundle has no
+            such file
+        """
+        location = self._files.get(key)
+        if location is None:
+            return None
+        offset, length = location
+        self._reads += 1
+        start = self.data_offset + offset
+        return memoryview(self._map)[start : start + length]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "bundle": str(self.path),
+            "built": self.built,
+            "modules": len(self._modules),
+            "exercises": len(self._exercises),
+            "files": len(self._files),
+            "reads": self._reads,
+        }
@@ -0,0 +1,85 @@
+"""
+Lazy handles to course file contents.
+
+get_module_by_id hands out a small handle instead of the module's text, so
+session state holds a reference rather than its own copy of every lesson.
+The text is decoded only when a page renders it. Handles into the course
+bundle read straight from its memory map, which lives in the page cache and
+is shared by every session in the process. Files in the course/ tree are
+read normally: authors edit them in place, and a mapped file that shrinks
+under a reader would crash the process with SIGBUS.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+
+class ContentHandle(ABC):
+    """Reference to one course file whose contents are read on demand."""
+
+    __slots__ = ()
+
+    @abstractmethod
+    def view(self) -> Optional[memoryview]:
+        """Raw contents, or None if the file does not exist."""
+
+    def exists(self) -> bool:
+        return self.view() is not None
+
+    def read_bytes(self) -> Optional[bytes]:
+        view = self.view()
+        return bytes(view) if view is not None else None
+
+    def read(self) -> str:
+        """Decode the contents as UTF-8 ("" if the file does not exist)."""
+        view = self.view()
+        return str(view, "utf-8") if view is not None else ""
+
+    def __str__(self) -> str:
+        return self.read()
+
+
+class FileContent(ContentHandle):
+    """A file in the course/ tree."""
+
+    __slots__ = ("path",)
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def exists(self) -> bool:
+        # A stat, so checking a handle does not read the whole file
+        return os.path.isfile(self.path)
+
+    def view(self) -> Optional[memoryview]:
+        try:
+            return memoryview(self.path.read_bytes())
+        except FileNotFoundError:
+            return None
+
+    def read_bytes(self) -> Optional[bytes]:
+        try:
+            return self.path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def __repr__(self) -> str:
+        return f"FileContent({str(self.path)!r})"
+
+
+class BundleContent(ContentHandle):
+    """A file inside the course bundle."""
+
+    __slots__ = ("bundle", "key")
+
+    def __init__(self, bundle, key: str):
+        self.bundle = bundle
+        self.key = key
+
+    def view(self) -> Optional[memoryview]:
+        return self.bundle.view(self.key)
+
+    def __repr__(self) -> str:
+        return f"BundleContent({self.key!r})"
@@ -0,0 +1,286 @@
+"""
+Process-wide index of course module and exercise metadata.
+
+The index is built on first use and shared by every session. Later lookups
+only stat the course directories and metadata files (at most once per check
+interval) and re-parse the metadata.json files whose mtime changed, instead
+of listing and parsing the whole course tree on every Streamlit rerun.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Seconds between mtime checks of the course tree; 0 checks on every lookup
+COURSE_INDEX_CHECK_INTERVAL = float(os.environ.get("COURSE_INDEX_CHECK_INTERVAL", "2"))
+
+METADATA_FILE = "metadata.json"
+
+
+def index_entries(
+    entries: List[Dict[str, Any]], group_by: Optional[str] = None
+) -> Tuple[
+    List[Dict[str, Any]], Dict[str, Dict[str, Any]], Dict[Any, List[Dict[str, Any]]]
+]:
+    """
+    Order entries and build their lookups.
+
+    Args:
+        entries (List[Dict[str, Any]]): Metadata of every entry, by ID order
+        group_by (Optional[str]): Metadata field to group entries by
+
+    Returns:
+        Tuple: Entries sorted by "order", entries by ID, and entries grouped
+        by the group_by field (empty without group_by)
+    """
+    ordered = sorted(entries, key=lambda m: m.get("order", 999))
+    by_id = {metadata["id"]: metadata for metadata in ordered}
+
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    if group_by:
+        for metadata in ordered:
+            groups.setdefault(metadata.get(group_by), []).append(metadata)
+    return ordered, by_id, groups
+
+
+class _Section:
+    """Metadata of every entry (module or exercise) under one directory."""
+
+    def __init__(self, kind: str, directory: Path, group_by: Optional[str] = None):
+        self.kind = kind
+        self.directory = directory
+        self.group_by = group_by
+        # entry ID -> (metadata.json mtime_ns, metadata or None if unreadable)
+        self.entries: Dict[str, Tuple[int, Optional[Dict[str, Any]]]] = {}
+        self.ordered: List[Dict[str, Any]] = []
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        # group_by value -> entries in order, e.g. moduleId -> exercises
+        self.groups: Dict[Any, List[Dict[str, Any]]] = {}
+        self.missing = False
+        self.warned = set()
+
+    def scan(self) -> Tuple[bool, int]:
+        """
+        Pick up added, removed and modified entries.
+
+        Returns:
+            Tuple[bool, int]: Whether anything changed, and the number of
+            metadata files parsed
+        """
+        if not self.directory.is_dir():
+            if not self.missing:
+                print(
+                    f"Warning: {self.kind.capitalize()}s directory not found "
+                    f"at {self.directory}"
+                )
+                self.missing = True
+            changed = bool(self.entries)
+            self.entries.clear()
+            if changed:
+                self._rebuild()
+            return changed, 0
+        self.missing = False
+
+        seen = set()
+        changed = False
+        parsed = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.is_dir():
+                    continue
+                present, entry_changed = self._update(entry.name)
+                if present:
+                    seen.add(entry.name)
+                if entry_changed:
+                    changed = True
+                    parsed += present
+
+        for entry_id in list(self.entries):
+            if entry_id not in seen:
+                del self.entries[entry_id]
+                changed = True
+
+        if changed:
+            self._rebuild()
+        return changed, parsed
+
+    def scan_entry(self, entry_id: str) -> Tuple[bool, int]:
+        """
+        Pick up changes to a single entry, e.g. after a file watcher event.
+
+        Returns:
+            Tuple[bool, int]: Whether the entry changed, and the number of
+            metadata files parsed
+        """
+        present, changed = self._update(entry_id)
+        if changed:
+            self._rebuild()
+        return changed, int(changed and present)
+
+    def _update(self, entry_id: str) -> Tuple[bool, bool]:
+        """
+        Re-read an entry's metadata if its mtime changed.
+
+        Returns:
+            Tuple[bool, bool]: Whether the entry exists, and whether it changed
+        """
+        metadata_file = os.path.join(self.directory, entry_id, METADATA_FILE)
+        try:
+            mtime = os.stat(metadata_file).st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            # Warn once, not on every check
+            if entry_id not in self.warned and os.path.isdir(
+                os.path.join(self.directory, entry_id)
+            ):
+                print(f"Warning: Metadata file not found for {self.kind} {entry_id}")
+                self.warned.add(entry_id)
+            return False, self.entries.pop(entry_id, None) is not None
+
+        self.warned.discard(entry_id)
+        cached = self.entries.get(entry_id)
+        if cached is not None and cached[0] == mtime:
+            return True, False
+        self.entries[entry_id] = (mtime, self._load(entry_id, metadata_file))
+        return True, True
+
+    def _load(self, entry_id: str, metadata_file: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(metadata_file, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            metadata["id"] = entry_id
+            return metadata
+        except Exception as e:
+            print(f"Error loading {self.kind} {entry_id}: {str(e)}")
+            return None
+
+    def _rebuild(self):
+        """Recompute the ordered list, the ID lookup and the groups."""
+        self.ordered, self.by_id, self.groups = index_entries(
+            [
+                metadata
+                for _, (_, metadata) in sorted(self.entries.items())
+                if metadata is not None
+            ],
+            self.group_by,
+        )
+
+
+class CourseIndex:
+    """Shared, lazily refreshed index of modules and exercises."""
+
+    def __init__(
+        self,
+        modules_dir: Path,
+        exercises_dir: Path,
+        check_interval: float = COURSE_INDEX_CHECK_INTERVAL,
+    ):
+        self.check_interval = check_interval
+        self._modules = _Section("module", modules_dir)
+        self._exercises = _Section("exercise", exercises_dir, group_by="moduleId")
+        self._lock = threading.Lock()
+        self._checked_at: Optional[float] = None
+        self._stats = {"hits": 0, "checks": 0, "rebuilds": 0, "files_parsed": 0}
+        # Bumped on every change to the course, for use in cache keys
+        self.version = 0
+        # Set while a file watcher keeps the index up to date, so lookups
+        # skip the mtime checks entirely
+        self.watched = False
+
+    def _refresh(self):
+        """Re-check the course tree if the check interval has passed."""
+        with self._lock:
+            now = time.monotonic()
+            if self.watched and self._checked_at is not None:
+                self._stats["hits"] += 1
+                return
+            if (
+                self._checked_at is not None
+                and now - self._checked_at < self.check_interval
+            ):
+                self._stats["hits"] += 1
+                return
+
+            self._stats["checks"] += 1
+            rebuilt = False
+            for section in (self._modules, self._exercises):
+                changed, parsed = section.scan()
+                self._stats["files_parsed"] += parsed
+                rebuilt = rebuilt or changed
+            if rebuilt:
+                self._stats["rebuilds"] += 1
+                self.version += 1
+            else:
+                self._stats["hits"] += 1
+            self._checked_at = now
+
+    def file_changed(self, kind: str, entry_id: str, filename: str):
+        """
+        Update the index for one changed file, without rescanning the tree.
+
+        Args:
+            kind (str): "module" or "exercise"
+            entry_id (str): Module or exercise ID
+            filename (str): File name relative to the entry directory, ""
+                if the entry directory itself was added or removed
+        """
+        section = self._modules if kind == "module" else self._exercises
+        with self._lock:
+            changed, parsed = section.scan_entry(entry_id)
+            self._stats["files_parsed"] += parsed
+            if changed:
+                self._stats["rebuilds"] += 1
+            self.version += 1
+
+    def invalidate(self):
+        """Force the next lookup to re-check the course tree."""
+        with self._lock:
+            self._checked_at = None
+
+    def modules(self) -> List[Dict[str, Any]]:
+        """Module metadata sorted by "order"."""
+        self._refresh()
+        return [dict(metadata) for metadata in self._modules.ordered]
+
+    def module(self, module_id: str) -> Optional[Dict[str, Any]]:
+        """Metadata of one module, or None if it does not exist."""
+        self._refresh()
+        metadata = self._modules.by_id.get(module_id)
+        return dict(metadata) if metadata is not None else None
+
+    def exercises(self) -> List[Dict[str, Any]]:
+        """Exercise metadata sorted by "order"."""
+        self._refresh()
+        return [dict(metadata) for metadata in self._exercises.ordered]
+
+    def exercises_for_module(self, module_id: str) -> List[Dict[str, Any]]:
+        """Metadata of one module's exercises sorted by "order"."""
+        self._refresh()
+        return [
+            dict(metadata) for metadata in self._exercises.groups.get(module_id, [])
+        ]
+
+    def exercise(self, exercise_id: str) -> Optional[Dict[str, Any]]:
+        """Metadata of one exercise, or None if it does not exist."""
+        self._refresh()
+        metadata = self._exercises.by_id.get(exercise_id)
+        return dict(metadata) if metadata is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get index counters.
+
+        Returns:
+            Dict[str, int]: Lookups served without re-parsing ("hits"), mtime
+            scans ("checks"), scans that changed the index ("rebuilds"),
+            metadata files parsed, and the number of indexed entries
+        """
+        with self._lock:
+            return dict(
+                self._stats,
+                version=self.version,
+                modules=len(self._modules.ordered),
+                exercises=len(self._exercises.ordered),
+            )
@@ -4,100 +4,170 @@ This reduces database operations to stay within Firebase free tier limits.
 """
 
 import os
-import json
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from typing import List, Dict, Any, Optional, Union
 from pathlib import Path
 
+from utils.course_bundle import BundleError, CourseBundle
+from utils.course_content import BundleContent, ContentHandle, FileContent
+from utils.course_index import COURSE_INDEX_CHECK_INTERVAL, CourseIndex
+from utils.course_watcher import CourseWatcher
+
 # Define paths
-PROJECT_ROOT = Path(__file__).parent.parent
+# The course directory lives next to streamlit_app/, at the repository root
+PROJECT_ROOT = Path(__file__).parent.parent.parent
 COURSE_DIR = PROJECT_ROOT / "course"
 MODULES_DIR = COURSE_DIR / "modules"
 EXERCISES_DIR = COURSE_DIR / "exercises"
 
-
-def get_all_modules() -> List[Dict[str, Any]]:
+# Compiled course bundle, see tools/build_course_bundle.py. With
+# COURSE_SOURCE "auto" content is served from the bundle when it exists and
+# from the course/ tree otherwise (development); "directory" ignores it.
+COURSE_BUNDLE = Path(os.environ.get("COURSE_BUNDLE", PROJECT_ROOT / "course.bundle"))
+COURSE_SOURCE = os.environ.get("COURSE_SOURCE", "auto")
+
+# Follow edits to course/ while the app runs, see utils/course_watcher.py.
+# Only applies while content is served from the course/ tree, not the bundle
+COURSE_WATCH = os.environ.get("COURSE_WATCH", "0") == "1"
+
+# Metadata of all modules and exercises, shared by every session
+course_index = CourseIndex(MODULES_DIR, EXERCISES_DIR)
+
+# Started on the first lookup served from the course/ tree, so tools that
+# import this module do not start it
+course_watcher: Optional[CourseWatcher] = None
+_watch_warned = False
+
+_bundle: Optional[CourseBundle] = None
+_bundle_checked_at: Optional[float] = None
+_bundle_lock = threading.Lock()
+
+
+def _update_watcher(source: Union[CourseBundle, CourseIndex]):
+    """Start the course watcher when COURSE_WATCH applies to the source."""
+    global course_watcher, _watch_warned
+    if isinstance(source, CourseBundle):
+        if not _watch_warned:
+            _watch_warned = True
+            print(
+                f"COURSE_WATCH=1 has no effect while serving from {COURSE_BUNDLE}; "
+                "set COURSE_SOURCE=directory to follow edits to course/"
+            )
+        return
+    if course_watcher is None:
+        course_watcher = CourseWatcher(course_index, COURSE_DIR)
+        course_watcher.start()
+
+
+def _course_source() -> Union[CourseBundle, CourseIndex]:
     """
-    Get all available modules from the filesystem.
+    Get where course content is served from.
+
+    The bundle is reopened when a deploy replaces the file, and dropped in
+    favour of the course/ tree when it disappears. With COURSE_WATCH=1 the
+    course watcher starts on the first lookup served from the course/ tree.
 
     Returns:
-        List[Dict[str, Any]]: List of module metadata dictionaries
+        Union[CourseBundle, CourseIndex]: The bundle if one is in use, the
+        index of the course/ tree otherwise
     """
-    modules = []
-
-    # Check if modules directory exists
-    if not MODULES_DIR.exists():
-        print(f"Warning: Modules directory not found at {MODULES_DIR}")
-        return modules
-
-    # Iterate through module directories
-    for module_dir in sorted(MODULES_DIR.iterdir()):
-        if not module_dir.is_dir():
-            continue
+    source: Union[CourseBundle, CourseIndex] = course_index
+    if COURSE_SOURCE != "directory":
+        bundle = _current_bundle()
+        if bundle is not None:
+            source = bundle
+
+    if COURSE_WATCH and course_watcher is None:
+        with _bundle_lock:
+            _update_watcher(source)
+    return source
+
+
+def _current_bundle() -> Optional[CourseBundle]:
+    """Get the course bundle, reopened if a deploy replaced the file."""
+    global _bundle, _bundle_checked_at
+    with _bundle_lock:
+        now = time.monotonic()
+        if (
+            _bundle_checked_at is None
+            or now - _bundle_checked_at >= COURSE_INDEX_CHECK_INTERVAL
+        ):
+            _bundle_checked_at = now
+            if _bundle is None or not _bundle.is_current():
+                _bundle = None
+                if COURSE_BUNDLE.exists():
+                    try:
+                        _bundle = CourseBundle(COURSE_BUNDLE)
+                        print(f"Serving course content from {COURSE_BUNDLE}")
+                    except (OSError, ValueError, KeyError, BundleError) as e:
+                        print(f"Error loading course bundle: {str(e)}")
+        return _bundle
+
+
+def _course_file(
+    source: Union[CourseBundle, CourseIndex], kind: str, entry_id: str, filename: str
+) -> ContentHandle:
+    """
+    Get a lazy handle to one file of a module or exercise.
 
-        # Get module ID from directory name
-        module_id = module_dir.name
+    Args:
+        source (Union[CourseBundle, CourseIndex]): From _course_source
+        kind (str): "module" or "exercise"
+        entry_id (str): Module or exercise ID
+        filename (str): File name inside the module or exercise directory
 
-        # Load metadata
-        metadata_file = module_dir / "metadata.json"
-        if not metadata_file.exists():
-            print(f"Warning: Metadata file not found for module {module_id}")
-            continue
+    Returns:
+        ContentHandle: Handle into the bundle or the course tree
+    """
+    if isinstance(source, CourseBundle):
+        return BundleContent(source, CourseBundle.file_key(kind, entry_id, filename))
+    entry_dir = MODULES_DIR if kind == "module" else EXERCISES_DIR
+    return FileContent(entry_dir / entry_id / filename)
 
-        try:
-            with open(metadata_file, "r", encoding="utf-8") as f:
-                metadata = json.load(f)
 
-            # Add module ID to metadata
-            metadata["id"] = module_id
+def _read_course_file(
+    source: Union[CourseBundle, CourseIndex], kind: str, entry_id: str, filename: str
+) -> Optional[bytes]:
+    """Read one file of a module or exercise, None if it does not exist."""
+    return _course_file(source, kind, entry_id, filename).read_bytes()
 
-            # Add to modules list
-            modules.append(metadata)
-        except Exception as e:
-            print(f"Error loading module {module_id}: {str(e)}")
 
-    # Sort modules by order field
-    modules.sort(key=lambda m: m.get("order", 999))
+def get_all_modules() -> List[Dict[str, Any]]:
+    """
+    Get all available modules from the filesystem.
 
-    return modules
+    Returns:
+        List[Dict[str, Any]]: List of module metadata dictionaries
+    """
+    return _course_source().modules()
 
 
 def get_module_by_id(module_id: str) -> Optional[Dict[str, Any]]:
     """
     Get a specific module's data by ID.
 
+    "content" is a lazy handle to the module's text: str(content) or
+    content.read() reads it, so the text is not copied into every caller.
+
     Args:
         module_id (str): ID of the module to get
 
     Returns:
         Optional[Dict[str, Any]]: Module data if found, None otherwise
     """
-    module_dir = MODULES_DIR / module_id
-
-    # Check if module directory exists
-    if not module_dir.exists() or not module_dir.is_dir():
-        print(f"Module directory not found: {module_dir}")
-        return None
-
-    # Load metadata
-    metadata_file = module_dir / "metadata.json"
-    if not metadata_file.exists():
-        print(f"Metadata file not found for module {module_id}")
+    source = _course_source()
+    metadata = source.module(module_id)
+    if metadata is None:
+        print(f"Module not found: {module_id}")
         return None
 
     try:
-        # Load metadata
-        with open(metadata_file, "r", encoding="utf-8") as f:
-            metadata = json.load(f)
-
-        # Add module ID
-        metadata["id"] = module_id
-
         # Load content
-        content_file = module_dir / "content.md"
-        metadata["filename"] = str(content_file)
-        if content_file.exists():
-            with open(content_file, "r", encoding="utf-8") as f:
-                metadata["content"] = f.read()
+        metadata["filename"] = str(MODULES_DIR / module_id / "content.md")
+        content = _course_file(source, "module", module_id, "content.md")
+        if content.exists():
+            metadata["content"] = content
         else:
             metadata["content"] = "Content not available."
             print(f"Content file not found for module {module_id}")
@@ -118,48 +188,7 @@ def get_exercises_by_module(module_id: str) -> List[Dict[str, Any]]:
     Returns:
         List[Dict[str, Any]]: List of exercise metadata dictionaries
     """
-    exercises = []
-
-    # Check if exercises directory exists
-    if not EXERCISES_DIR.exists():
-        print(f"Warning: Exercises directory not found at {EXERCISES_DIR}")
-        return exercises
-
-    # Iterate through exercise directories
-    for exercise_dir in sorted(EXERCISES_DIR.iterdir()):
-        if not exercise_dir.is_dir():
-            continue
-
-        # Get exercise ID from directory name
-        exercise_id = exercise_dir.name
-
-        # Load metadata
-        metadata_file = exercise_dir / "metadata.json"
-        print(f"metadata_file {metadata_file}")
-        if not metadata_file.exists():
-            print(f"Warning: Metadata file not found for exercise {exercise_id}")
-            continue
-
-        try:
-            with open(metadata_file, "r", encoding="utf-8") as f:
-                metadata = json.load(f)
-
-            # Check if this exercise belongs to the requested module
-            if metadata.get("moduleId") != module_id:
-                continue
-
-            # Add exercise ID to metadata
-            metadata["id"] = exercise_id
-
-            # Add to exercises list
-            exercises.append(metadata)
-        except Exception as e:
-            print(f"Error loading exercise {exercise_id}: {str(e)}")
-
-    # Sort exercises by order field
-    exercises.sort(key=lambda e: e.get("order", 999))
-
-    return exercises
+    return _course_source().exercises_for_module(module_id)
 
 
 def get_exercise_by_id(exercise_id: str) -> Optional[Dict[str, Any]]:
@@ -172,41 +201,29 @@ def get_exercise_by_id(exercise_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         Optional[Dict[str, Any]]: Exercise data if found, None otherwise
     """
-    exercise_dir = EXERCISES_DIR / exercise_id
-
-    # Check if exercise directory exists
-    if not exercise_dir.exists() or not exercise_dir.is_dir():
-        print(f"Exercise directory not found: {exercise_dir}")
-        return None
-
-    # Load metadata
-    metadata_file = exercise_dir / "metadata.json"
-    if not metadata_file.exists():
-        print(f"Metadata file not found for exercise {exercise_id}")
+    source = _course_source()
+    metadata = source.exercise(exercise_id)
+    if metadata is None:
+        print(f"Exercise not found: {exercise_id}")
         return None
 
     try:
-        # Load metadata
-        with open(metadata_file, "r", encoding="utf-8") as f:
-            metadata = json.load(f)
-
-        # Add exercise ID
-        metadata["id"] = exercise_id
-
         # Load description
-        description_file = exercise_dir / "description.md"
-        if description_file.exists():
-            with open(description_file, "r", encoding="utf-8") as f:
-                metadata["description"] = f.read()
+        description = _read_course_file(
+            source, "exercise", exercise_id, "description.md"
+        )
+        if description is not None:
+            metadata["description"] = description.decode("utf-8")
         else:
             metadata["description"] = "Description not available."
             print(f"Description file not found for exercise {exercise_id}")
 
         # Load starter code
-        starter_code_file = exercise_dir / "starter_code.py"
-        if starter_code_file.exists():
-            with open(starter_code_file, "r", encoding="utf-8") as f:
-                metadata["starterCode"] = f.read()
+        starter_code = _read_course_file(
+            source, "exercise", exercise_id, "starter_code.py"
+        )
+        if starter_code is not None:
+            metadata["starterCode"] = starter_code.decode("utf-8")
         else:
             metadata["starterCode"] = "# Your code here"
             print(f"Starter code file not found for exercise {exercise_id}")
@@ -227,15 +244,12 @@ def get_test_file_for_exercise(exercise_id: str) -> tuple:
     Returns:
         tuple: (success, message, test_content)
     """
-    exercise_dir = EXERCISES_DIR / exercise_id
-    test_file = exercise_dir / "test.py"
-
-    if not test_file.exists():
-        return False, f"Test file not found for exercise {exercise_id}", None
-
     try:
-        with open(test_file, "rb") as f:
-            test_content = f.read()
+        test_content = _read_course_file(
+            _course_source(), "exercise", exercise_id, "test.py"
+        )
+        if test_content is None:
+            return False, f"Test file not found for exercise {exercise_id}", None
         return True, "Test file loaded successfully", test_content
     except Exception as e:
         return False, f"Error loading test file: {str(e)}", None
@@ -243,8 +257,11 @@ def get_test_file_for_exercise(exercise_id: str) -> tuple:
 
 def mark_module_completed(user_id: str, module_id: str) -> bool:
     """
-    Mark a module as completed for a user in Firebase.
-    This still uses Firebase to track user progress.
+    Mark a module as completed for a user in the storage backend
+    (Firebase by default, see utils/storage.py).
+
+    With write-behind enabled the completion is queued and written in the
+    background, see utils/progress_queue.py.
 
     Args:
         user_id (str): User ID
@@ -253,16 +270,25 @@ def mark_module_completed(user_id: str, module_id: str) -> bool:
     Returns:
         bool: Success status
     """
-    # Import Firebase functions here to avoid circular imports
-    from shared.firebase import mark_module_completed as firebase_mark_module_completed
+    # Import storage functions here to avoid circular imports
+    from utils.storage import mark_module_completed as storage_mark_module_completed
+    from utils.progress_queue import get_progress_queue
+    from utils.user_cache import invalidate_user
 
-    return firebase_mark_module_completed(user_id, module_id)
+    invalidate_user(user_id)
+    queue = get_progress_queue()
+    if queue is not None and queue.record(user_id, "module", module_id):
+        return True
+    return storage_mark_module_completed(user_id, module_id)
 
 
 def mark_exercise_completed(user_id: str, exercise_id: str) -> bool:
     """
-    Mark an exercise as completed for a user in Firebase.
-    This still uses Firebase to track user progress.
+    Mark an exercise as completed for a user in the storage backend
+    (Firebase by default, see utils/storage.py).
+
+    With write-behind enabled the completion is queued and written in the
+    background, see utils/progress_queue.py.
 
     Args:
         user_id (str): User ID
@@ -271,12 +297,18 @@ def mark_exercise_completed(user_id: str, exercise_id: str) -> bool:
     Returns:
         bool: Success status
     """
-    # Import Firebase functions here to avoid circular imports
-    from shared.firebase import (
-        mark_exercise_completed as firebase_mark_exercise_completed,
+    # Import storage functions here to avoid circular imports
+    from utils.storage import (
+        mark_exercise_completed as storage_mark_exercise_completed,
     )
-
-    return firebase_mark_exercise_completed(user_id, exercise_id)
+    from utils.progress_queue import get_progress_queue
+    from utils.user_cache import invalidate_user
+
+    invalidate_user(user_id)
+    queue = get_progress_queue()
+    if queue is not None and queue.record(user_id, "exercise", exercise_id):
+        return True
+    return storage_mark_exercise_completed(user_id, exercise_id)
 
 
 def ensure_course_directories():
@@ -0,0 +1,168 @@
+"""
+Hot reload of course content while the app is running.
+
+With COURSE_WATCH=1 a watcher follows changes under course/ and reports each
+changed file to the course index, which re-reads only the affected entry.
+While the watcher runs, lookups skip the index's own mtime checks. Rendered
+content needs no notification, the render cache is keyed on content hashes.
+
+The watcher uses inotify through the watchdog package. Without it, or when
+inotify cannot be used, it falls back to stat-ing the whole tree every
+COURSE_WATCH_INTERVAL seconds, which is only meant for small courses.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Polled instead
+    FileSystemEventHandler = object
+    Observer = None
+
+from utils.course_index import CourseIndex
+
+# Seconds between scans when polling
+COURSE_WATCH_INTERVAL = float(os.environ.get("COURSE_WATCH_INTERVAL", "1"))
+
+# Directory names of the two entry kinds under course/
+KIND_DIRS = {"modules": "module", "exercises": "exercise"}
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forwards watchdog events to the watcher."""
+
+    def __init__(self, watcher: "CourseWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type not in ("created", "modified", "deleted", "moved"):
+            return
+        self.watcher.path_changed(event.src_path)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.watcher.path_changed(dest_path)
+
+
+class CourseWatcher:
+    """Watches the course directory and updates the course index."""
+
+    def __init__(
+        self,
+        index: CourseIndex,
+        course_dir: Path,
+        interval: float = COURSE_WATCH_INTERVAL,
+    ):
+        self.index = index
+        self.course_dir = Path(course_dir).resolve()
+        self.interval = interval
+        self.mode: Optional[str] = None
+        self.events = 0
+        self._observer = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start watching with inotify if possible, polling otherwise."""
+        if self.mode is not None:
+            return
+
+        if Observer is not None:
+            try:
+                observer = Observer()
+                observer.schedule(
+                    _EventHandler(self), str(self.course_dir), recursive=True
+                )
+                observer.daemon = True
+                observer.start()
+                self._observer = observer
+                self.mode = "inotify"
+            except OSError as e:
+                # E.g. the inotify watch limit is exhausted
+                print(f"Error starting file watcher, polling instead: {str(e)}")
+
+        if self._observer is None:
+            self._thread = threading.Thread(
+                target=self._poll, name="course-watcher", daemon=True
+            )
+            self._thread.start()
+            self.mode = "polling"
+
+        self.index.watched = True
+        print(f"Watching {self.course_dir} for changes ({self.mode})")
+
+    def stop(self):
+        """Stop watching; the index goes back to its own mtime checks."""
+        self.index.watched = False
+        self.index.invalidate()
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=2)
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.mode = None
+
+    def path_changed(self, path: str):
+        """
+        Report a changed path to the index.
+
+        Args:
+            path (str): Added, modified or removed file or directory
+        """
+        try:
+            relative = Path(path).resolve().relative_to(self.course_dir)
+        except ValueError:
+            return
+        parts = relative.parts
+        # Only files inside an entry directory (or the directory itself)
+        if len(parts) < 2 or parts[0] not in KIND_DIRS:
+            return
+        if any(part == "__pycache__" or part.startswith(".") for part in parts[1:]):
+            return
+
+        self.events += 1
+        self.index.file_changed(KIND_DIRS[parts[0]], parts[1], "/".join(parts[2:]))
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """Stat every file under the course directory."""
+        snapshot = {}
+        for root, dirs, files in os.walk(self.course_dir):
+            dirs[:] = [d for d in dirs if d != "__pycache__" and not d.startswith(".")]
+            # Record directories too, so empty added or removed entries count
+            snapshot[root] = (0, 0)
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _poll(self):
+        previous = self._snapshot()
+        while not self._stop.wait(self.interval):
+            try:
+                current = self._snapshot()
+            except OSError as e:
+                print(f"Error scanning course directory: {str(e)}")
+                continue
+            changed = {
+                path
+                for path in previous.keys() | current.keys()
+                if previous.get(path) != current.get(path)
+            }
+            for path in sorted(changed):
+                self.path_changed(path)
+            previous = current
+
+    def stats(self) -> Dict[str, object]:
+        """Get watcher state and the course version."""
+        return {"mode": self.mode, "events": self.events, "version": self.index.version}
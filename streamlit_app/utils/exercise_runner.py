@@ -3,191 +3,585 @@ Exercise testing utilities for running pytest on submitted code.
 """
 
 import os
+import json
+import re
+import signal
 from pathlib import Path
 import sys
+import shutil
 import tempfile
+import threading
+import time
 import subprocess
-import importlib.util
-from typing import Tuple, List, Dict, Any, Optional
+from collections import Counter
+from concurrent.futures import Future
+from typing import Dict, Any, Optional
+
+from models.grading import (
+    GradingResult,
+    TestCaseResult,
+    PASSED,
+    FAILED,
+    ERROR,
+    TIMEOUT,
+    MEMORY_EXCEEDED,
+)
+from utils.grading_cache import get_grading_cache, make_cache_key
+from utils.grading_limits import resolve_limits, truncate_output
+from utils.grading_plugin import GRADING_PYTEST_ARGS
+from utils.grading_pool import (
+    get_fork_server,
+    get_worker_pool,
+    WorkerCrashedError,
+    WorkerTimeoutError,
+)
+
+# Bump whenever a change to the runner can change grading results, so
+# cached results from older runners are not served
+RUNNER_VERSION = f"4-py{sys.version_info[0]}.{sys.version_info[1]}"
+
+# pytest exit codes caused by the submission itself (tests failed,
+# collection error such as a SyntaxError, no tests collected)
+SUBMISSION_FAILURE_EXIT_CODES = (1, 2, 5)
+
+# Signal the kernel sends when RLIMIT_CPU is exceeded
+CPU_LIMIT_SIGNAL = getattr(signal, "SIGXCPU", None)
+MEMORY_ERROR_PATTERN = re.compile(r"\bMemoryError\b")
+
+# Script that applies resource limits before exec'ing pytest
+UTILS_DIR = Path(__file__).resolve().parent
+LIMITS_LAUNCHER = UTILS_DIR / "grading_limits.py"
+
+# How submissions are graded: "pool" runs pytest in pre-warmed worker
+# processes, "forkserver" forks a fresh child of a preloaded process per
+# submission, "subprocess" starts a fresh pytest process per submission
+GRADING_MODE = os.environ.get("GRADING_MODE", "pool")
+
+# Exercises whose metadata asks for "runner": "inline" are graded in-process
+# unless this is switched off
+GRADING_INLINE_ENABLED = os.environ.get("GRADING_INLINE_ENABLED", "1") == "1"
+
+# The only limit the inline runner can enforce
+INLINE_LIMITS = {"wallTime"}
+
+# Seconds to wait for a free pool worker before giving up
+GRADING_POOL_WAIT = float(os.environ.get("GRADING_POOL_WAIT", "60"))
+
+# Every grading job gets its own directory under this root
+WORKSPACE_ROOT = Path(
+    os.environ.get(
+        "GRADING_WORKSPACE_ROOT",
+        os.path.join(tempfile.gettempdir(), "pycamp-grading"),
+    )
+)
+# Workspaces older than this (seconds) are considered abandoned
+GRADING_WORKSPACE_MAX_AGE = float(os.environ.get("GRADING_WORKSPACE_MAX_AGE", "600"))
+# How often (seconds) and how many abandoned workspaces one sweep removes
+GRADING_WORKSPACE_GC_INTERVAL = float(
+    os.environ.get("GRADING_WORKSPACE_GC_INTERVAL", "60")
+)
+GRADING_WORKSPACE_GC_LIMIT = int(os.environ.get("GRADING_WORKSPACE_GC_LIMIT", "100"))
+
+_last_workspace_gc = 0.0
+_workspace_gc_lock = threading.Lock()
+
+# Gradings currently running, by cache key, so identical submissions that
+# arrive while the first one is still being graded wait for its result
+_in_flight: Dict[str, Future] = {}
+_in_flight_lock = threading.Lock()
+_in_flight_stats = {"runs": 0, "coalesced": 0}
+
+
+def create_workspace() -> str:
+    """
+    Create a unique workspace directory for one grading job.
+
+    The exercise module and its test file are written side by side in the
+    workspace, so concurrent submissions never share files.
+
+    Returns:
+        str: Path to the new workspace directory
+    """
+    WORKSPACE_ROOT.mkdir(parents=True, exist_ok=True)
+    _maybe_cleanup_stale_workspaces()
+    return tempfile.mkdtemp(prefix="job-", dir=WORKSPACE_ROOT)
+
+
+def cleanup_workspace(workspace: str):
+    """
+    Remove a grading workspace and everything in it.
+
+    Args:
+        workspace (str): Path returned by create_workspace
+    """
+    shutil.rmtree(workspace, ignore_errors=True)
+
+
+def cleanup_stale_workspaces(
+    max_age: float = GRADING_WORKSPACE_MAX_AGE,
+    limit: int = GRADING_WORKSPACE_GC_LIMIT,
+) -> int:
+    """
+    Remove workspaces left behind by jobs that never cleaned up.
+
+    Args:
+        max_age (float): Age in seconds after which a workspace is stale
+        limit (int): Maximum number of workspaces removed in one pass
+
+    Returns:
+        int: Number of workspaces removed
+    """
+    if not WORKSPACE_ROOT.exists():
+        return 0
+
+    cutoff = time.time() - max_age
+    removed = 0
+    with os.scandir(WORKSPACE_ROOT) as entries:
+        for entry in entries:
+            if removed >= limit:
+                break
+            try:
+                if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                    cleanup_workspace(entry.path)
+                    removed += 1
+            except OSError:
+                continue
+
+    return removed
+
+
+def _maybe_cleanup_stale_workspaces():
+    """Run the stale workspace cleanup at most once per GC interval."""
+    global _last_workspace_gc
+    if time.time() - _last_workspace_gc < GRADING_WORKSPACE_GC_INTERVAL:
+        return
+    # Only one thread sweeps, the others carry on grading
+    if not _workspace_gc_lock.acquire(blocking=False):
+        return
+    try:
+        _last_workspace_gc = time.time()
+        removed = cleanup_stale_workspaces()
+        if removed:
+            print(f"Removed {removed} stale grading workspaces")
+    finally:
+        _workspace_gc_lock.release()
 
 
-def save_code_to_temp_file(code: str, filename: str = "exercise.py") -> str:
+def save_code_to_temp_file(
+    code: str, workspace: str, filename: str = "exercise.py"
+) -> str:
     """
-    Save code to a temporary file.
+    Save code to a file in a grading workspace.
 
     Args:
         code (str): Python code to save
+        workspace (str): Workspace directory from create_workspace
         filename (str): Name for the file
 
     Returns:
-        str: Path to the temporary file
+        str: Path to the saved file
     """
-    # Create a temporary directory
-    # temp_dir = tempfile.mkdtemp()
-    Path("temp").mkdir(parents=True, exist_ok=True)
-    temp_dir = Path("temp")
-    file_path = temp_dir / filename
-    # file_path = os.path.join(temp_dir, filename)
-    print(f"save_code_to_temp_file filename:  {file_path}")
+    file_path = os.path.join(workspace, filename)
 
     # Write code to the file
-    with open(file_path, "w") as f:
+    with open(file_path, "w", encoding="utf-8") as f:
         f.write(code)
     return file_path
 
 
-def save_test_to_temp_file(test_code: str, filename: str = "test_exercise.py") -> str:
+def save_test_to_temp_file(
+    test_code: str, workspace: str, filename: str = "test_exercise.py"
+) -> str:
     """
-    Save test code to a temporary file.
+    Save test code to a file in a grading workspace.
 
     Args:
         test_code (str): Test code to save
+        workspace (str): Workspace directory from create_workspace
         filename (str): Name for the test file
 
     Returns:
-        str: Path to the temporary file
+        str: Path to the saved file
     """
-    # Create a temporary directory
-    # temp_dir = tempfile.mkdtemp()
-    Path("temp").mkdir(parents=True, exist_ok=True)
-    temp_dir = Path("temp")
-    file_path = os.path.join(temp_dir, filename)
+    file_path = os.path.join(workspace, filename)
 
     # Write test code to the file
-    with open(file_path, "w") as f:
+    with open(file_path, "w", encoding="utf-8") as f:
         f.write(test_code)
 
     return file_path
 
 
-def run_pytest(test_file: str) -> Tuple[bool, List[str]]:
+def _read_output(path: str, max_bytes: int) -> str:
+    """Read at most max_bytes of captured output from a file."""
+    with open(path, "rb") as f:
+        data = f.read(max_bytes + 1 if max_bytes else -1)
+    return truncate_output(data.decode("utf-8", errors="replace"), max_bytes)
+
+
+def _execute_subprocess(test_file: str, limits: Dict[str, Any]) -> Dict[str, Any]:
+    """Run pytest in a fresh process and return the raw run record."""
+    test_file = os.path.abspath(test_file)
+    workspace = os.path.dirname(test_file)
+    report_path = os.path.join(workspace, "grading-report.json")
+    stdout_path = os.path.join(workspace, "pytest.stdout")
+    stderr_path = os.path.join(workspace, "pytest.stderr")
+
+    # Make the grading plugin importable by the pytest process
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(UTILS_DIR), env.get("PYTHONPATH")])
+    )
+
+    # Output goes to files rather than pipes so a print loop cannot
+    # balloon the server's memory; only maxOutputBytes is read back
+    with open(stdout_path, "wb") as stdout, open(stderr_path, "wb") as stderr:
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                str(LIMITS_LAUNCHER),
+                json.dumps(limits),
+                "pytest",
+                test_file,
+                "-p",
+                "grading_plugin",
+                f"--grading-report={report_path}",
+                f"--rootdir={workspace}",
+                *GRADING_PYTEST_ARGS,
+            ],
+            stdout=stdout,
+            stderr=stderr,
+            env=env,
+            # Relative paths the submission writes stay in its workspace
+            cwd=workspace,
+        )
+        try:
+            returncode = process.wait(timeout=limits["wallTime"])
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise TimeoutError(f"Job exceeded {limits['wallTime']:g}s wall time")
+
+    tests = []
+    if os.path.exists(report_path):
+        with open(report_path, "r", encoding="utf-8") as f:
+            tests = json.load(f)
+
+    max_output = limits["maxOutputBytes"]
+    return {
+        "returncode": returncode,
+        "tests": tests,
+        "stdout": _read_output(stdout_path, max_output),
+        "stderr": _read_output(stderr_path, max_output),
+    }
+
+
+def _execute_in_pool(test_file: str, limits: Dict[str, Any]) -> Dict[str, Any]:
+    """Run pytest in a warm pool worker and return the raw run record."""
+    try:
+        return get_worker_pool().run(
+            {"test_file": os.path.abspath(test_file), "limits": limits},
+            timeout=GRADING_POOL_WAIT,
+            job_timeout=limits["wallTime"],
+        )
+    except WorkerTimeoutError as e:
+        raise TimeoutError(str(e)) from e
+    except WorkerCrashedError as e:
+        if e.returncode is None:
+            raise
+        # Report the exit status so a CPU limit kill is classified as such
+        return {
+            "returncode": e.returncode,
+            "stderr": f"Grading worker exited with code {e.returncode}",
+        }
+
+
+def _execute_in_fork_server(test_file: str, limits: Dict[str, Any]) -> Dict[str, Any]:
+    """Run pytest in a child of the fork server and return the raw run record."""
+    try:
+        return get_fork_server().run(
+            {"test_file": os.path.abspath(test_file), "limits": limits},
+            job_timeout=limits["wallTime"],
+        )
+    except WorkerTimeoutError as e:
+        raise TimeoutError(str(e)) from e
+    except WorkerCrashedError as e:
+        if e.returncode is None:
+            raise
+        return {
+            "returncode": e.returncode,
+            "stderr": f"Grading process exited with code {e.returncode}",
+        }
+
+
+def _run(execute, test_file: str, limits: Optional[Dict[str, Any]]) -> GradingResult:
+    """Run an executor and turn its output or failure into a GradingResult."""
+    limits = resolve_limits(limits)
+    try:
+        return _build_result(execute(test_file, limits))
+    except TimeoutError as e:
+        return GradingResult(status=TIMEOUT, messages=[str(e)])
+    except Exception as e:
+        return GradingResult(status=ERROR, messages=[f"Error running pytest: {str(e)}"])
+
+
+def run_pytest(
+    test_file: str, limits: Optional[Dict[str, Any]] = None
+) -> GradingResult:
     """
-    Run pytest on a test file.
+    Run pytest on a test file in a fresh, resource-limited process.
 
     Args:
         test_file (str): Path to the test file
+        limits (Optional[Dict[str, Any]]): Overrides for the default limits
 
     Returns:
-        Tuple[bool, List[str]]:
-            - Success status (bool)
-            - List of test result messages
+        GradingResult: Outcome and test result messages
     """
-    try:
-        # Run pytest using subprocess
-        result = subprocess.run(
-            ["pytest", test_file, "-v"], capture_output=True, text=True, check=False
-        )
+    return _run(_execute_subprocess, test_file, limits)
 
-        # Parse the output
-        output_lines = result.stdout.split("\n")
-        error_lines = result.stderr.split("\n")
 
-        # Filter out empty lines and add error lines if any
-        messages = [line for line in output_lines if line.strip()]
-        if any(error_lines):
-            messages.extend([f"ERROR: {line}" for line in error_lines if line.strip()])
+def run_pytest_in_pool(
+    test_file: str, limits: Optional[Dict[str, Any]] = None
+) -> GradingResult:
+    """
+    Run pytest on a test file using a pre-warmed worker from the pool.
+
+    Args:
+        test_file (str): Path to the test file
+        limits (Optional[Dict[str, Any]]): Overrides for the default limits
 
-        # Check if all tests passed
-        success = result.returncode == 0
+    Returns:
+        GradingResult: Outcome and test result messages
+    """
+    return _run(_execute_in_pool, test_file, limits)
 
-        return success, messages
-    except Exception as e:
-        return False, [f"Error running pytest: {str(e)}"]
+
+def run_pytest_in_fork_server(
+    test_file: str, limits: Optional[Dict[str, Any]] = None
+) -> GradingResult:
+    """
+    Run pytest in a child forked from the preloaded fork server.
+
+    Args:
+        test_file (str): Path to the test file
+        limits (Optional[Dict[str, Any]]): Resource limits
+
+    Returns:
+        GradingResult: Outcome and test result messages
+    """
+    return _run(_execute_in_fork_server, test_file, limits)
+
+
+def _build_result(run: Dict[str, Any]) -> GradingResult:
+    """
+    Turn a raw run record from an executor into a GradingResult.
+
+    Args:
+        run (Dict[str, Any]): pytest "returncode" (negative if killed by a
+            signal), per-test records in "tests", and "stdout"/"stderr"
+
+    Returns:
+        GradingResult: Outcome, one message per test and the test records
+    """
+    returncode = run["returncode"]
+    tests = [TestCaseResult(**test) for test in run.get("tests", [])]
+
+    messages = []
+    for test in tests:
+        line = f"{test.outcome.upper()}: {test.name} ({test.duration:.3f}s)"
+        if test.message:
+            line += f" - {test.message.splitlines()[0]}"
+        messages.append(line)
+
+    counts = Counter(test.outcome for test in tests)
+    if counts:
+        summary = ", ".join(f"{count} {outcome}" for outcome, count in counts.items())
+        messages.append(f"{summary} in {sum(t.duration for t in tests):.2f}s")
+
+    # Anything printed outside of tests, e.g. pytest usage errors
+    for stream, prefix in (("stdout", ""), ("stderr", "ERROR: ")):
+        messages.extend(
+            f"{prefix}{line}"
+            for line in run.get(stream, "").split("\n")
+            if line.strip()
+        )
+
+    failure_text = "\n".join([run.get("stderr", "")] + [t.message for t in tests])
+    if CPU_LIMIT_SIGNAL is not None and returncode == -CPU_LIMIT_SIGNAL:
+        status = TIMEOUT
+        messages.append("CPU time limit exceeded")
+    elif MEMORY_ERROR_PATTERN.search(failure_text):
+        status = MEMORY_EXCEEDED
+    elif returncode == 0:
+        status = PASSED
+    elif returncode in SUBMISSION_FAILURE_EXIT_CODES:
+        status = FAILED
+    else:
+        status = ERROR
+
+    return GradingResult(status=status, messages=messages, tests=tests)
 
 
 def test_exercise(
-    exercise_content: bytes, test_content: bytes
-) -> Tuple[bool, List[str]]:
+    exercise_content: bytes,
+    test_content: bytes,
+    limits: Optional[Dict[str, Any]] = None,
+    runner: Optional[str] = None,
+) -> GradingResult:
     """
     Test a submitted exercise against provided tests.
 
     Args:
         exercise_content (bytes): Submitted Python file content
         test_content (bytes): Test file content
+        limits (Optional[Dict[str, Any]]): Per-exercise overrides for the
+            default resource limits (see utils/grading_limits.py)
+        runner (Optional[str]): "inline" to grade in-process (the exercise's
+            "runner" metadata); anything else uses GRADING_MODE. Exercises
+            that set limits other than wallTime are never graded inline,
+            since only the wall time can be enforced in-process
 
     Returns:
-        Tuple[bool, List[str]]:
-            - Success status (bool)
-            - List of test result messages
+        GradingResult: Outcome and test result messages
     """
+    inline = (
+        runner == "inline"
+        and GRADING_INLINE_ENABLED
+        and set(limits or {}) <= INLINE_LIMITS
+    )
+    limits = resolve_limits(limits)
+
+    # Serve repeated submissions from the result cache
+    cache = get_grading_cache()
+    cache_key = make_cache_key(
+        exercise_content,
+        test_content,
+        f"{RUNNER_VERSION}:{inline}:{json.dumps(limits, sort_keys=True)}",
+    )
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return GradingResult.model_validate(cached)
+
+    # Join an identical grading that is already running instead of
+    # starting another one
+    with _in_flight_lock:
+        future = _in_flight.get(cache_key)
+        leader = future is None
+        if leader:
+            future = _in_flight[cache_key] = Future()
+            _in_flight_stats["runs"] += 1
+        else:
+            _in_flight_stats["coalesced"] += 1
+    if not leader:
+        # Each waiter gets its own copy of the shared result
+        return future.result().model_copy(deep=True)
+
+    try:
+        result = _grade(exercise_content, test_content, limits, inline)
+        # Only cache outcomes decided by the submission itself, never limit
+        # hits or infrastructure failures such as a crashed worker
+        if cache is not None and result.status in (PASSED, FAILED):
+            cache.put(cache_key, result.model_dump())
+        future.set_result(result)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[cache_key]
+
+    return result
+
+
+def _grade(
+    exercise_content: bytes,
+    test_content: bytes,
+    limits: Dict[str, Any],
+    inline: bool,
+) -> GradingResult:
+    """Grade one submission with the configured runner, bypassing the cache."""
     # Convert bytes to string
     exercise_code = exercise_content.decode("utf-8")
     test_code = test_content.decode("utf-8")
 
-    # Save to temporary files
-    exercise_file = save_code_to_temp_file(exercise_code)
-    test_file = save_test_to_temp_file(test_code)
+    if inline:
+        # Imported here so the server only loads pytest if inline is used
+        from utils.inline_runner import InlineBusyError
 
-    # Make sure the test can import the exercise file
-    exercise_dir = os.path.dirname(exercise_file)
-    test_dir = os.path.dirname(test_file)
-    print(f"PATHS, {exercise_dir}, {test_dir}")
-    # Add the exercise directory to Python path if they're different
-    if exercise_dir != test_dir:
-        sys.path.append(exercise_dir)
-
-    # Run tests
-    success, messages = run_pytest(test_file)
+        try:
+            return validate_exercise_inline(exercise_code, test_code, limits)
+        except InlineBusyError as e:
+            print(f"{e}, grading with the {GRADING_MODE} runner instead")
 
-    # Remove temporary files and directories
+    # Save both files into a workspace of their own, so the test can
+    # import the exercise module and no other job can overwrite them
+    workspace = create_workspace()
     try:
-        pass
-        # os.remove(exercise_file)
-        # os.remove(test_file)
-        # os.rmdir(os.path.dirname(exercise_file))
-        # if exercise_dir != test_dir:
-        #     os.rmdir(test_dir)
-    except:
-        pass
+        save_code_to_temp_file(exercise_code, workspace)
+        test_file = save_test_to_temp_file(test_code, workspace)
+
+        # Run tests
+        if GRADING_MODE == "pool":
+            result = run_pytest_in_pool(test_file, limits)
+        elif GRADING_MODE == "forkserver":
+            result = run_pytest_in_fork_server(test_file, limits)
+        else:
+            result = run_pytest(test_file, limits)
+    finally:
+        # Remove temporary files and directories
+        cleanup_workspace(workspace)
+
+    return result
+
 
-    return success, messages
+def in_flight_stats() -> Dict[str, int]:
+    """
+    Get in-flight deduplication counters.
+
+    Returns:
+        Dict[str, int]: Gradings actually run, requests that joined a
+        running grading instead, and gradings running right now
+    """
+    with _in_flight_lock:
+        return dict(_in_flight_stats, in_flight=len(_in_flight))
 
 
 def validate_exercise_inline(
-    exercise_code: str, test_code: str
-) -> Tuple[bool, List[str]]:
+    exercise_code: str, test_code: str, limits: Optional[Dict[str, Any]] = None
+) -> GradingResult:
     """
     Validate an exercise by running the test code in-process.
 
-    This is an alternative to running pytest as a subprocess, which
-    may be faster but less isolated.
+    This is an alternative to running pytest as a subprocess, which is
+    much faster but not isolated, and only limited in wall time, so it is
+    only meant for exercises with trusted, simple tests.
 
     Args:
         exercise_code (str): Python code to test
         test_code (str): Test code
+        limits (Optional[Dict[str, Any]]): Limits, of which only the wall
+            time applies
 
     Returns:
-        Tuple[bool, List[str]]:
-            - Success status (bool)
-            - List of test messages
-    """
-    try:
-        # Create a temporary module for the exercise
-        temp_module_name = f"exercise_{hash(exercise_code) % 10000}"
-        spec = importlib.util.spec_from_loader(temp_module_name, loader=None)
-        temp_module = importlib.util.module_from_spec(spec)
-        sys.modules[temp_module_name] = temp_module
-
-        # Execute the exercise code in the temporary module
-        exec(exercise_code, temp_module.__dict__)
-
-        # Prepare the test environment
-        test_globals = {"exercise": temp_module, "pytest": __import__("pytest")}
+        GradingResult: Outcome and test result messages
 
-        # Execute the test code
-        test_results = []
-        test_success = True
-
-        try:
-            exec(test_code, test_globals)
-            test_results.append("All tests passed!")
-        except Exception as e:
-            test_success = False
-            test_results.append(f"Test failed: {str(e)}")
-
-        # Clean up
-        del sys.modules[temp_module_name]
+    Raises:
+        InlineBusyError: If the inline runner is held by an earlier run that
+            could not be stopped
+    """
+    # Imported here so the server only loads pytest if inline is used
+    from utils.inline_runner import InlineBusyError, run_tests_inline
 
-        return test_success, test_results
+    limits = resolve_limits(limits)
+    try:
+        return _build_result(
+            run_tests_inline(exercise_code, test_code, limits["wallTime"])
+        )
+    except InlineBusyError:
+        raise
+    except TimeoutError as e:
+        return GradingResult(status=TIMEOUT, messages=[str(e)])
     except Exception as e:
-        return False, [f"Error running tests: {str(e)}"]
+        return GradingResult(status=ERROR, messages=[f"Error running tests: {str(e)}"])
@@ -4,43 +4,154 @@ Module and exercise content is stored locally to reduce database operations.
 """
 
 import os
-import json
+import threading
+import time
 import requests
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple
 import firebase_admin
 from firebase_admin import credentials, auth, firestore
+from google.api_core.exceptions import NotFound
 import streamlit as st
 
+from utils.http_client import HttpClient
+from utils.storage import PROGRESS_FIELDS, StorageBackend
+
 # Firebase authentication endpoint
 FIREBASE_AUTH_URL = "https://identitytoolkit.googleapis.com/v1/accounts"
 
-# Global variable to store firebase admin app
+# Document read by the health check; it does not need to exist
+HEALTH_CHECK_DOCUMENT = ("_health", "ping")
+
+# Pooled, keep-alive connections to the Firebase Auth REST API
+_auth_http = HttpClient("firebase-auth")
 
 
-def initialize_firebase():
-    firebase_admin_app = None
+class FirebaseClients:
     """
-    Initialize Firebase Admin SDK using credentials from environment variable or file.
+    Process-wide Firebase app and Firestore client.
+
+    Both are created once, on first use, and shared by every session and
+    thread, so calls reuse the same credentials and gRPC channels instead
+    of setting them up again.
     """
-    # global firebase_admin_app
-    creds = st.secrets["FIREBASE_CREDENTIALS"]
-
-    # Check if Firebase Admin is already initialized
-    if not firebase_admin._apps:
-        # If credentials are provided as a file
-        if creds:
-            creds = dict(creds)
-            cred = credentials.Certificate(creds)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.app = None
+        self._db = None
+
+    def initialize(self) -> bool:
+        """
+        Initialize the Firebase Admin SDK if it is not initialized yet.
+
+        Returns:
+            bool: Whether Firebase is ready to use
+        """
+        if self.app is not None:
+            return True
+
+        with self._lock:
+            if self.app is not None:
+                return True
+
+            # Another part of the process may have initialized it already
+            if firebase_admin._apps:
+                self.app = firebase_admin.get_app()
+                return True
+
+            try:
+                creds = st.secrets["FIREBASE_CREDENTIALS"]
+            except (KeyError, FileNotFoundError):
+                creds = None
+            if not creds:
+                print("Firebase credentials not found in Streamlit secrets")
+                return False
+
             try:
-                firebase_admin_app = firebase_admin.initialize_app(cred)
+                cred = credentials.Certificate(dict(creds))
+                self.app = firebase_admin.initialize_app(cred)
             except Exception as e:
-                print(f"Error initializing Firebase Admin from file: {e}")
+                print(f"Error initializing Firebase Admin: {e}")
                 return False
-        else:
-            print(f"Firebase credentials not found at {creds}")
-            return False
+        return True
+
+    def db(self):
+        """
+        Get the shared Firestore client.
+
+        Returns:
+            firestore.Client: Client of the initialized app, None if Firebase
+            could not be initialized
+        """
+        if self._db is not None:
+            return self._db
+        if not self.initialize():
+            return None
+        with self._lock:
+            if self._db is None:
+                self._db = firestore.client(self.app)
+            return self._db
+
+    def health_check(self) -> Tuple[bool, str, Dict[str, Any]]:
+        """
+        Check that Firestore is reachable with one document read.
+
+        Returns:
+            Tuple[bool, str, Dict]:
+                - Whether Firestore answered (bool)
+                - Message (str)
+                - Details: "initialized" and the read's "latencyMs"
+        """
+        details: Dict[str, Any] = {"initialized": False, "latencyMs": None}
+        db = self.db()
+        if db is None:
+            return False, "Firebase initialization failed", details
+        details["initialized"] = True
+
+        collection, document = HEALTH_CHECK_DOCUMENT
+        started = time.perf_counter()
+        try:
+            db.collection(collection).document(document).get()
+        except Exception as e:
+            return False, f"Firestore is not reachable: {str(e)}", details
+        details["latencyMs"] = round((time.perf_counter() - started) * 1000, 1)
+        return True, "Firestore is reachable", details
+
+
+_clients = FirebaseClients()
+
+
+def get_firebase_clients() -> FirebaseClients:
+    """Get the process-wide Firebase clients."""
+    return _clients
+
+
+def initialize_firebase() -> bool:
+    """
+    Initialize Firebase Admin SDK using credentials from Streamlit secrets.
+
+    Safe to call from anywhere and on every call; the SDK is only
+    initialized the first time.
+
+    Returns:
+        bool: Whether Firebase is ready to use
+    """
+    return _clients.initialize()
+
 
-    return True
+def get_firestore():
+    """Get the shared Firestore client, None if Firebase is unavailable."""
+    return _clients.db()
+
+
+def check_firebase_health() -> Tuple[bool, str, Dict[str, Any]]:
+    """Check that Firestore is reachable, see FirebaseClients.health_check."""
+    return _clients.health_check()
+
+
+def auth_http_stats() -> Dict[str, Any]:
+    """Get call counts and latencies of Firebase Auth REST calls."""
+    return _auth_http.stats()
 
 
 def _get_api_key():
@@ -84,7 +195,7 @@ def create_user(
         )
 
         # Create user document in Firestore
-        db = firestore.client()
+        db = get_firestore()
         user_ref = db.collection("users").document(user.uid)
         user_ref.set(
             {
@@ -143,7 +254,8 @@ def authenticate_user(
             "returnSecureToken": True,
         }
 
-        response = requests.post(signin_url, json=signin_payload)
+        # Sign-in has no side effects, so transient failures are retried
+        response = _auth_http.post(signin_url, json=signin_payload)
         data = response.json()
 
         if "error" in data:
@@ -166,7 +278,7 @@ def authenticate_user(
         user_record = auth.get_user(user_id)
 
         # Get additional user data from Firestore
-        db = firestore.client()
+        db = get_firestore()
         user_doc = db.collection("users").document(user_id).get()
 
         user_data = {
@@ -209,7 +321,7 @@ def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
         user = auth.get_user(user_id)
 
         # Get additional user data from Firestore
-        db = firestore.client()
+        db = get_firestore()
         user_doc = db.collection("users").document(user_id).get()
 
         user_data = {
@@ -231,41 +343,45 @@ def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
 
 
 # User progress tracking
-def mark_module_completed(user_id: str, module_id: str) -> bool:
-    """
-    Mark a module as completed for a user.
 
-    Args:
-        user_id (str): User ID
-        module_id (str): Module ID
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_WRITES = 500
 
-    Returns:
-        bool: Success status
+
+def _mark_completed(user_id: str, kind: str, item_id: str) -> bool:
+    """
+    Add one item to a user's completed list in a single atomic write.
+
+    ArrayUnion adds the item on the server unless it is already there, so
+    nothing is read first and concurrent completions (e.g. from two tabs)
+    cannot overwrite each other.
     """
     if not initialize_firebase():
         return False
 
     try:
-        db = firestore.client()
+        db = get_firestore()
         user_ref = db.collection("users").document(user_id)
+        # Fails with NotFound if the user document does not exist
+        user_ref.update({PROGRESS_FIELDS[kind]: firestore.ArrayUnion([item_id])})
+        return True
+    except Exception as e:
+        print(f"Error marking {kind} as completed: {str(e)}")
+        return False
 
-        # Get current user data
-        user_doc = user_ref.get()
-        if not user_doc.exists:
-            return False
 
-        user_data = user_doc.to_dict()
-        completed_modules = user_data.get("completedModules", [])
+def mark_module_completed(user_id: str, module_id: str) -> bool:
+    """
+    Mark a module as completed for a user.
 
-        # Add module to completed list if not already there
-        if module_id not in completed_modules:
-            completed_modules.append(module_id)
-            user_ref.update({"completedModules": completed_modules})
+    Args:
+        user_id (str): User ID
+        module_id (str): Module ID
 
-        return True
-    except Exception as e:
-        print(f"Error marking module as completed: {str(e)}")
-        return False
+    Returns:
+        bool: Success status
+    """
+    return _mark_completed(user_id, "module", module_id)
 
 
 def mark_exercise_completed(user_id: str, exercise_id: str) -> bool:
@@ -279,27 +395,103 @@ def mark_exercise_completed(user_id: str, exercise_id: str) -> bool:
     Returns:
         bool: Success status
     """
-    if not initialize_firebase():
-        return False
+    return _mark_completed(user_id, "exercise", exercise_id)
+
+
+def _commit_updates(db, users: List[Tuple[str, Dict[str, List[str]]]]):
+    """
+    Apply the progress updates of up to MAX_BATCH_WRITES users in one commit.
+
+    A single missing user document fails the whole commit with NotFound,
+    so on NotFound the missing documents are looked up and the commit is
+    retried without them. Only the failure path costs reads.
+    """
+
+    def commit(users):
+        batch = db.batch()
+        for user_id, fields in users:
+            batch.update(
+                db.collection("users").document(user_id),
+                {field: firestore.ArrayUnion(items) for field, items in fields.items()},
+            )
+        batch.commit()
 
     try:
-        db = firestore.client()
-        user_ref = db.collection("users").document(user_id)
+        commit(users)
+    except NotFound:
+        refs = [db.collection("users").document(user_id) for user_id, _ in users]
+        existing = {snapshot.id for snapshot in db.get_all(refs) if snapshot.exists}
+        missing = [user_id for user_id, _ in users if user_id not in existing]
+        print(f"Skipping completions of users that do not exist: {missing}")
+        remaining = [
+            (user_id, fields) for user_id, fields in users if user_id in existing
+        ]
+        if remaining:
+            commit(remaining)
+
+
+def mark_completed_many(completions: List[Tuple[str, str, str]]) -> bool:
+    """
+    Record several completions, of one or more users, in one commit.
 
-        # Get current user data
-        user_doc = user_ref.get()
-        if not user_doc.exists:
-            return False
+    Completions are grouped into a single atomic update per user document.
+    Beyond 500 users the updates are split over several commits.
+    Completions of users whose document does not exist (e.g. a deleted
+    account) are skipped and logged, without failing the other users.
 
-        user_data = user_doc.to_dict()
-        completed_exercises = user_data.get("completedExercises", [])
+    Args:
+        completions (List[Tuple[str, str, str]]): (user ID, kind, item ID)
+            tuples, kind being "module" or "exercise"
+
+    Returns:
+        bool: Success status; False if a commit failed, e.g. Firestore is
+        unavailable, in which case it can be retried
+    """
+    if not completions:
+        return True
+    if not initialize_firebase():
+        return False
 
-        # Add exercise to completed list if not already there
-        if exercise_id not in completed_exercises:
-            completed_exercises.append(exercise_id)
-            user_ref.update({"completedExercises": completed_exercises})
+    updates: Dict[str, Dict[str, List[str]]] = {}
+    for user_id, kind, item_id in completions:
+        items = updates.setdefault(user_id, {}).setdefault(PROGRESS_FIELDS[kind], [])
+        if item_id not in items:
+            items.append(item_id)
 
+    try:
+        db = get_firestore()
+        users = list(updates.items())
+        for start in range(0, len(users), MAX_BATCH_WRITES):
+            _commit_updates(db, users[start : start + MAX_BATCH_WRITES])
         return True
     except Exception as e:
-        print(f"Error marking exercise as completed: {str(e)}")
+        print(f"Error recording completions: {str(e)}")
         return False
+
+
+class FirebaseStorage(StorageBackend):
+    """Storage backend: accounts in Firebase Auth, progress in Firestore."""
+
+    name = "firebase"
+
+    def initialize(self) -> bool:
+        return initialize_firebase()
+
+    def create_user(
+        self, email: str, password: str, display_name: str
+    ) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        return create_user(email, password, display_name)
+
+    def authenticate_user(
+        self, email: str, password: str
+    ) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        return authenticate_user(email, password)
+
+    def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return get_user_by_id(user_id)
+
+    def mark_completed_many(self, completions: List[Tuple[str, str, str]]) -> bool:
+        return mark_completed_many(completions)
+
+    def mark_completed(self, user_id: str, kind: str, item_id: str) -> bool:
+        return _mark_completed(user_id, kind, item_id)
@@ -0,0 +1,268 @@
+"""
+Content-addressed cache of grading results.
+
+Results are keyed on a hash of the normalized submission, the test file and
+the runner version, so identical submissions (repeated clicks, or everyone
+pasting the same canonical solution) are graded once. Entries live in an
+in-memory LRU backed by a size-capped directory on disk.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Cache settings
+GRADING_CACHE_ENABLED = os.environ.get("GRADING_CACHE_ENABLED", "1") == "1"
+GRADING_CACHE_MEMORY_ENTRIES = int(
+    os.environ.get("GRADING_CACHE_MEMORY_ENTRIES", "512")
+)
+GRADING_CACHE_DISK_BYTES = int(
+    os.environ.get("GRADING_CACHE_DISK_BYTES", str(64 * 1024 * 1024))
+)
+GRADING_CACHE_DIR = Path(
+    os.environ.get(
+        "GRADING_CACHE_DIR",
+        os.path.join(tempfile.gettempdir(), "pycamp-grading-cache"),
+    )
+)
+
+# Bump when normalize_submission changes, so old entries are not reused
+NORMALIZATION_VERSION = 2
+
+
+def normalize_submission(content: bytes) -> bytes:
+    """
+    Normalize a submission so cosmetic differences share a cache entry.
+
+    Strips a UTF-8 BOM and converts line endings to LF, which Python does
+    itself when reading source. Other whitespace is kept: trailing spaces can
+    be part of a multi-line string, or turn a valid line continuation into a
+    SyntaxError.
+
+    Args:
+        content (bytes): Submitted Python file content
+
+    Returns:
+        bytes: Normalized content
+
+    Examples:
+        >>> normalize_submission(b"\\xef\\xbb\\xbfx = 1\\r\\n")
+        b'x = 1\\n'
+        >>> normalize_submission(b"x = 1 + \\\\ \\n2\\n")
+        b'x = 1 + \\\\ \\n2\\n'
+    """
+    if content.startswith(b"\xef\xbb\xbf"):
+        content = content[3:]
+    return content.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+
+def make_cache_key(
+    exercise_content: bytes, test_content: bytes, runner_version: str
+) -> str:
+    """
+    Build the content-addressed key for a grading job.
+
+    Args:
+        exercise_content (bytes): Submitted Python file content
+        test_content (bytes): Test file content
+        runner_version (str): Version of the grading runner
+
+    Returns:
+        str: Hex digest identifying the job
+    """
+    digest = hashlib.sha256()
+    for part in (
+        normalize_submission(exercise_content),
+        test_content,
+        f"{runner_version}:{NORMALIZATION_VERSION}".encode("utf-8"),
+    ):
+        # Length-prefix each part so the boundaries are unambiguous
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class GradingCache:
+    """In-memory LRU of grading results with a size-capped disk tier."""
+
+    def __init__(
+        self,
+        memory_entries: int = GRADING_CACHE_MEMORY_ENTRIES,
+        disk_dir: Optional[Path] = GRADING_CACHE_DIR,
+        disk_bytes: int = GRADING_CACHE_DISK_BYTES,
+    ):
+        self.memory_entries = max(1, memory_entries)
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_bytes = disk_bytes
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_usage = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_dir:
+            try:
+                self.disk_dir.mkdir(parents=True, exist_ok=True)
+                self._disk_usage = sum(
+                    entry.stat().st_size for entry in self.disk_dir.glob("*.json")
+                )
+            except OSError as e:
+                print(f"Grading cache disk tier disabled: {str(e)}")
+                self.disk_dir = None
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.json"
+
+    def _remember(self, key: str, value: Any):
+        """Insert into the memory tier, evicting the least recently used."""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached grading result.
+
+        Args:
+            key (str): Key from make_cache_key
+
+        Returns:
+            Optional[Any]: Cached result if present, None otherwise
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+        value = None
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                    value = json.load(f)
+                # Touch the file so disk eviction stays least recently used
+                os.utime(self._disk_path(key))
+            except (OSError, ValueError):
+                value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, value)
+            return value
+
+    def put(self, key: str, value: Any):
+        """
+        Store a grading result.
+
+        Args:
+            key (str): Key from make_cache_key
+            value (Any): JSON-serializable grading result
+        """
+        with self._lock:
+            self._remember(key, value)
+
+        if not self.disk_dir:
+            return
+
+        data = json.dumps(value)
+        path = self._disk_path(key)
+        try:
+            # Write then rename so readers never see a partial entry
+            temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error writing grading cache entry: {str(e)}")
+            return
+
+        with self._lock:
+            self._disk_usage += len(data.encode("utf-8"))
+            over_budget = self._disk_usage > self.disk_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Delete the least recently used disk entries until under budget."""
+        try:
+            entries = [
+                (entry.stat().st_mtime, entry.stat().st_size, entry)
+                for entry in self.disk_dir.glob("*.json")
+            ]
+        except OSError:
+            return
+
+        entries.sort()
+        usage = sum(size for _, size, _ in entries)
+        # Leave some headroom so we do not evict on every write
+        target = self.disk_bytes * 0.9
+        for _, size, entry in entries:
+            if usage <= target:
+                break
+            try:
+                entry.unlink()
+            except OSError:
+                continue
+            usage -= size
+            self.evictions += 1
+
+        with self._lock:
+            self._disk_usage = usage
+
+    def clear(self):
+        """Drop every cached result from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+            self._disk_usage = 0
+        if self.disk_dir:
+            for entry in self.disk_dir.glob("*.json"):
+                try:
+                    entry.unlink()
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_usage,
+                "evictions": self.evictions,
+            }
+
+
+_cache: Optional[GradingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_grading_cache() -> Optional[GradingCache]:
+    """
+    Get the process-wide grading cache.
+
+    Returns:
+        Optional[GradingCache]: Shared cache, or None if caching is disabled
+    """
+    global _cache
+    if not GRADING_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = GradingCache()
+        return _cache
@@ -0,0 +1,197 @@
+"""
+Fork-server grading process.
+
+Started by utils/grading_pool.py. The server imports pytest, the grading
+plugin and the modules the exercise tests depend on once, runs a throwaway
+pytest session, then fork()s a fresh child for every job. Children share the
+preloaded interpreter copy-on-write, so each submission gets its own process
+without paying the interpreter and pytest start-up cost, and nothing one
+submission does can leak into the next.
+
+Jobs arrive as JSON lines on stdin. Each child writes its result to the
+job's "result_file"; the server reports the child's exit on stdout:
+
+    {"id": 1, "status": "done"}
+    {"id": 2, "status": "timeout"}
+    {"id": 3, "status": "crashed", "returncode": -24}
+"""
+
+import gc
+import importlib
+import json
+import os
+import select
+import signal
+import sys
+import time
+from typing import Any, Dict, List
+
+from grading_worker import run_job, warm_up
+
+
+def preload(modules: List[str]):
+    """
+    Import modules so every forked child starts with them loaded.
+
+    Args:
+        modules (List[str]): Module names, e.g. the exercise tests' imports
+    """
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Error preloading {name}: {str(e)}", file=sys.stderr)
+
+
+def _run_child(job: Dict[str, Any], protocol, wakeup_fd: int):
+    """Grade one job in a freshly forked child and exit."""
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    os.close(wakeup_fd)
+    protocol.close()
+
+    exitcode = 0
+    try:
+        result = run_job(job)
+        with open(job["result_file"], "w", encoding="utf-8") as f:
+            json.dump(result, f)
+    except BaseException as e:
+        print(f"Error in grading child: {str(e)}", file=sys.stderr)
+        exitcode = 70
+    finally:
+        # Skip atexit handlers and buffers inherited from the server
+        os._exit(exitcode)
+
+
+def _reap(children: Dict[int, Dict[str, Any]], protocol):
+    """Report every child that has exited."""
+    while children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+
+        child = children.pop(pid, None)
+        if child is None:
+            continue
+
+        message = {"id": child["id"]}
+        if child.get("killed"):
+            message["status"] = "timeout"
+        elif os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0:
+            message["status"] = "done"
+        else:
+            message["status"] = "crashed"
+            message["returncode"] = (
+                -os.WTERMSIG(status)
+                if os.WIFSIGNALED(status)
+                else os.WEXITSTATUS(status)
+            )
+        protocol.write(json.dumps(message) + "\n")
+
+
+def _kill_overdue(children: Dict[int, Dict[str, Any]]) -> float:
+    """
+    Kill children past their wall-clock limit.
+
+    Returns:
+        float: Seconds until the next deadline, or -1 if there is none
+    """
+    now = time.monotonic()
+    next_deadline = None
+    for pid, child in children.items():
+        deadline = child.get("deadline")
+        if deadline is None or child.get("killed"):
+            continue
+        if deadline <= now:
+            child["killed"] = True
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        elif next_deadline is None or deadline < next_deadline:
+            next_deadline = deadline
+    return -1 if next_deadline is None else next_deadline - now
+
+
+def serve(protocol):
+    """
+    Fork a child per job until stdin is closed.
+
+    Args:
+        protocol: Text stream for status messages
+    """
+    children: Dict[int, Dict[str, Any]] = {}
+
+    # SIGCHLD wakes up the select loop through the wakeup pipe
+    wakeup_read, wakeup_write = os.pipe()
+    os.set_blocking(wakeup_read, False)
+    os.set_blocking(wakeup_write, False)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    signal.set_wakeup_fd(wakeup_write)
+
+    stdin = sys.stdin.fileno()
+    pending = b""
+    stdin_open = True
+
+    while stdin_open or children:
+        wait = _kill_overdue(children)
+        readable = [wakeup_read] + ([stdin] if stdin_open else [])
+        try:
+            ready, _, _ = select.select(readable, [], [], None if wait < 0 else wait)
+        except InterruptedError:
+            ready = []
+
+        if wakeup_read in ready:
+            try:
+                while os.read(wakeup_read, 512):
+                    pass
+            except BlockingIOError:
+                pass
+        _reap(children, protocol)
+
+        if stdin not in ready:
+            continue
+
+        data = os.read(stdin, 65536)
+        if not data:
+            stdin_open = False
+            continue
+        pending += data
+        while b"\n" in pending:
+            line, pending = pending.split(b"\n", 1)
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            pid = os.fork()
+            if pid == 0:
+                _run_child(job, protocol, wakeup_read)
+            wall_time = (job.get("limits") or {}).get("wallTime")
+            children[pid] = {
+                "id": job["id"],
+                "deadline": time.monotonic() + wall_time if wall_time else None,
+            }
+
+
+def main():
+    # Keep the real stdout for the job protocol and point fd 1 at /dev/null,
+    # so anything a submission writes straight to the fd cannot corrupt it.
+    protocol = os.fdopen(os.dup(1), "w", encoding="utf-8", buffering=1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    preload(json.loads(sys.argv[1]) if len(sys.argv) > 1 else [])
+    warm_up()
+    # Move everything loaded so far out of the collector's reach, so the
+    # children's garbage collections do not un-share the preloaded pages
+    gc.freeze()
+    protocol.write(json.dumps({"ready": True}) + "\n")
+
+    serve(protocol)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Resource limits for graded submissions.
+
+Limits are given as a dict with the same keys exercises use in the "limits"
+section of their metadata.json:
+
+    wallTime        seconds of real time before the job is killed
+    cpuTime         seconds of CPU time (RLIMIT_CPU)
+    memoryMb        address space cap in megabytes (RLIMIT_AS)
+    maxOutputBytes  bytes of pytest output kept per stream
+
+Also runnable as a launcher that applies the limits and then execs a
+command, so a fresh grading process is limited from its first instruction:
+
+    python grading_limits.py '{"cpuTime": 5}' pytest test_exercise.py -v
+"""
+
+import json
+import math
+import os
+import sys
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+DEFAULT_LIMITS = {
+    "wallTime": float(os.environ.get("GRADING_WALL_TIME", "10")),
+    "cpuTime": float(os.environ.get("GRADING_CPU_TIME", "5")),
+    "memoryMb": int(os.environ.get("GRADING_MEMORY_MB", "256")),
+    "maxOutputBytes": int(os.environ.get("GRADING_MAX_OUTPUT_BYTES", "65536")),
+}
+
+
+def resolve_limits(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Merge per-exercise overrides into the default limits.
+
+    Args:
+        overrides (Optional[Dict[str, Any]]): "limits" from exercise metadata
+
+    Returns:
+        Dict[str, Any]: Complete set of limits
+    """
+    limits = dict(DEFAULT_LIMITS)
+    for key, value in (overrides or {}).items():
+        if key in limits and value is not None:
+            limits[key] = type(DEFAULT_LIMITS[key])(value)
+    return limits
+
+
+def apply_limits(limits: Dict[str, Any]) -> Dict[int, Any]:
+    """
+    Apply CPU and memory limits to the current process.
+
+    The CPU limit is relative to the CPU time already used, so long-lived
+    workers can apply it once per job.
+
+    Args:
+        limits (Dict[str, Any]): Limits from resolve_limits
+
+    Returns:
+        Dict[int, Any]: Previous limits, for restore_limits
+    """
+    saved = {}
+    if resource is None:
+        return saved
+
+    if limits.get("cpuTime"):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = usage.ru_utime + usage.ru_stime
+        saved[resource.RLIMIT_CPU] = _set_soft_limit(
+            resource.RLIMIT_CPU, int(math.ceil(used + limits["cpuTime"]))
+        )
+
+    if limits.get("memoryMb"):
+        saved[resource.RLIMIT_AS] = _set_soft_limit(
+            resource.RLIMIT_AS, int(limits["memoryMb"]) * 1024 * 1024
+        )
+
+    return saved
+
+
+def restore_limits(saved: Dict[int, Any]):
+    """
+    Restore limits returned by apply_limits.
+
+    Args:
+        saved (Dict[int, Any]): Previous limits
+    """
+    for limit, value in saved.items():
+        try:
+            resource.setrlimit(limit, value)
+        except (ValueError, OSError) as e:
+            print(f"Error restoring resource limit: {str(e)}", file=sys.stderr)
+
+
+def _set_soft_limit(limit: int, value: int):
+    """Lower the soft limit (never above the hard limit) and return the old one."""
+    soft, hard = resource.getrlimit(limit)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    resource.setrlimit(limit, (value, hard))
+    return soft, hard
+
+
+def truncate_output(text: str, max_bytes: int) -> str:
+    """
+    Cut output down to at most max_bytes of UTF-8.
+
+    Args:
+        text (str): Captured output
+        max_bytes (int): Maximum number of bytes to keep
+
+    Returns:
+        str: Output, with a marker appended if it was cut
+    """
+    data = text.encode("utf-8")
+    if not max_bytes or len(data) <= max_bytes:
+        return text
+    kept = data[:max_bytes].decode("utf-8", errors="ignore")
+    return f"{kept}\n[output truncated after {max_bytes} bytes]\n"
+
+
+if __name__ == "__main__":
+    apply_limits(json.loads(sys.argv[1]))
+    os.execvp(sys.argv[2], sys.argv[2:])
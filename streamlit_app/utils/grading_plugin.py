@@ -0,0 +1,118 @@
+"""
+pytest plugin that records a compact, structured report of a grading run.
+
+The grading worker registers a ResultCollector instance directly. A fresh
+pytest process loads the module instead and writes the report as JSON:
+
+    pytest test_exercise.py -p grading_plugin --grading-report=report.json
+"""
+
+import json
+import os
+from typing import Any, Dict, List
+
+# Longest assertion message / captured output kept per test
+MAX_FIELD_CHARS = 2000
+
+# Extra pytest arguments for grading runs: results come from this plugin,
+# so the terminal reporter and the cache are skipped
+GRADING_PYTEST_ARGS = ["-p", "no:terminal", "-p", "no:cacheprovider"]
+
+
+def _truncate(text: str, limit: int = MAX_FIELD_CHARS) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit] + "\n[truncated]"
+
+
+def _failure_message(report) -> str:
+    """Get the short failure reason of a report, e.g. the assertion message."""
+    longrepr = report.longrepr
+    if longrepr is None:
+        return ""
+    reprcrash = getattr(longrepr, "reprcrash", None)
+    if reprcrash is not None:
+        return reprcrash.message
+    if isinstance(longrepr, tuple):
+        # Skips are reported as (path, lineno, reason)
+        return str(longrepr[2])
+    return report.longreprtext
+
+
+def _collection_error_message(report) -> str:
+    """Get the error lines (pytest's "E   ...") of a collection failure."""
+    lines = report.longreprtext.splitlines()
+    errors = [line[1:].strip() for line in lines if line.startswith("E ")]
+    if errors:
+        return "\n".join(errors)
+    return lines[-1].strip() if lines else ""
+
+
+class ResultCollector:
+    """Collects one record per test from pytest's report hooks."""
+
+    def __init__(self):
+        self._records: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def tests(self) -> List[Dict[str, Any]]:
+        """Records in the order the tests ran."""
+        return list(self._records.values())
+
+    def _record(self, nodeid: str) -> Dict[str, Any]:
+        if nodeid not in self._records:
+            self._records[nodeid] = {
+                "nodeid": nodeid,
+                "outcome": "passed",
+                "duration": 0.0,
+                "message": "",
+                "output": "",
+            }
+        return self._records[nodeid]
+
+    def pytest_runtest_logreport(self, report):
+        record = self._record(report.nodeid)
+        record["duration"] += report.duration
+
+        if report.when == "call":
+            record["outcome"] = report.outcome
+            output = report.capstdout + report.capstderr
+            if output:
+                record["output"] = _truncate(output)
+        elif report.failed:
+            # A broken fixture during setup or teardown
+            record["outcome"] = "error"
+        elif report.skipped:
+            record["outcome"] = "skipped"
+
+        if report.failed or report.skipped:
+            record["message"] = _truncate(_failure_message(report))
+
+    def pytest_collectreport(self, report):
+        # Import errors in the submission surface as collection failures
+        if report.failed:
+            record = self._record(os.path.basename(report.nodeid) or "collection")
+            record["outcome"] = "error"
+            record["message"] = _truncate(_collection_error_message(report))
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--grading-report",
+        default=None,
+        help="Write a structured JSON grading report to this path",
+    )
+
+
+def pytest_configure(config):
+    path = config.getoption("--grading-report")
+    if path:
+        config._grading_collector = ResultCollector()
+        config.pluginmanager.register(config._grading_collector, "grading-collector")
+
+
+def pytest_unconfigure(config):
+    collector = getattr(config, "_grading_collector", None)
+    if collector is not None:
+        with open(config.getoption("--grading-report"), "w", encoding="utf-8") as f:
+            json.dump(collector.tests, f)
@@ -0,0 +1,457 @@
+"""
+Pool of pre-warmed grading worker processes.
+
+Each worker runs utils/grading_worker.py with pytest already imported and
+accepts jobs over its stdin/stdout pipes, so a submission does not pay the
+interpreter and pytest start-up cost. Every job runs in a child forked from
+the worker, so jobs never share interpreter state. Workers are recycled
+after a fixed number of jobs or when they crash.
+
+The fork server (utils/grading_forkserver.py) is the alternative: one
+preloaded process that forks a fresh child per job, so jobs never share
+interpreter state.
+"""
+
+import ast
+import atexit
+import itertools
+import json
+import os
+import queue
+import select
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+
+# Pool settings
+GRADING_POOL_SIZE = int(os.environ.get("GRADING_POOL_SIZE", "2"))
+GRADING_WORKER_MAX_JOBS = int(os.environ.get("GRADING_WORKER_MAX_JOBS", "50"))
+
+WORKER_SCRIPT = Path(__file__).parent / "grading_worker.py"
+FORK_SERVER_SCRIPT = Path(__file__).parent / "grading_forkserver.py"
+
+# Extra seconds to wait for the fork server, or a worker, after a job's
+# wall-clock limit; both kill the job themselves when it runs out
+FORK_SERVER_GRACE = 5
+
+
+class WorkerCrashedError(Exception):
+    """Raised when a worker process dies or breaks the job protocol."""
+
+    def __init__(self, message: str, returncode: Optional[int] = None):
+        super().__init__(message)
+        self.returncode = returncode
+
+
+class WorkerTimeoutError(Exception):
+    """Raised when a job runs past its wall-clock limit."""
+
+
+class GradingWorker:
+    """A single warm worker process talking JSON lines over pipes."""
+
+    def __init__(self):
+        self.jobs_done = 0
+        self.process = subprocess.Popen(
+            [sys.executable, "-B", str(WORKER_SCRIPT)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        # Block until pytest is imported and warmed up
+        self._read_message()
+
+    def _read_message(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        if timeout is not None:
+            ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+            if not ready:
+                self.process.kill()
+                self.process.wait()
+                raise WorkerTimeoutError(f"Job exceeded {timeout:g}s wall time")
+
+        line = self.process.stdout.readline()
+        if not line:
+            try:
+                returncode = self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                returncode = None
+            raise WorkerCrashedError(
+                f"Worker exited with code {returncode}", returncode
+            )
+        return json.loads(line)
+
+    def run(
+        self, job: Dict[str, Any], timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Send a job to the worker and wait for its result.
+
+        Args:
+            job (Dict[str, Any]): Job description, see grading_worker.run_job
+            timeout (Optional[float]): Wall-clock seconds the job may run;
+                the worker is killed if it has not answered shortly after
+
+        Returns:
+            Dict[str, Any]: Raw pytest result from the worker
+
+        Raises:
+            WorkerTimeoutError: If the job ran past its wall time
+        """
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+            result = self._read_message(
+                timeout + FORK_SERVER_GRACE if timeout else None
+            )
+        except (OSError, ValueError) as e:
+            raise WorkerCrashedError(str(e)) from e
+        finally:
+            self.jobs_done += 1
+        if result.get("timeout"):
+            # The worker killed the job's child and is ready for the next
+            raise WorkerTimeoutError(f"Job exceeded {timeout:g}s wall time")
+        return result
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def close(self):
+        """Stop the worker process."""
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=2)
+        except Exception:
+            self.process.kill()
+            self.process.wait()
+
+
+class WorkerPool:
+    """Fixed-size pool of warm grading workers shared by all sessions."""
+
+    def __init__(
+        self, size: int = GRADING_POOL_SIZE, max_jobs: int = GRADING_WORKER_MAX_JOBS
+    ):
+        self.size = max(1, size)
+        self.max_jobs = max(1, max_jobs)
+        self._idle: "queue.Queue[GradingWorker]" = queue.Queue()
+        self._workers: List[GradingWorker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.recycled = 0
+        self.crashed = 0
+
+        threads = [
+            threading.Thread(target=self._add_worker, daemon=True)
+            for _ in range(self.size)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _add_worker(self):
+        try:
+            worker = GradingWorker()
+        except Exception as e:
+            print(f"Error starting grading worker: {str(e)}")
+            return
+        with self._lock:
+            if self._closed:
+                worker.close()
+                return
+            self._workers.append(worker)
+        self._idle.put(worker)
+
+    def _retire_worker(self, worker: GradingWorker):
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        worker.close()
+        # Start the replacement in the background so the caller is not delayed
+        threading.Thread(target=self._add_worker, daemon=True).start()
+
+    def run(
+        self,
+        job: Dict[str, Any],
+        timeout: Optional[float] = None,
+        job_timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run a job on the next idle worker.
+
+        Args:
+            job (Dict[str, Any]): Job description, see grading_worker.run_job
+            timeout (Optional[float]): Seconds to wait for an idle worker
+            job_timeout (Optional[float]): Wall-clock seconds the job may run
+
+        Returns:
+            Dict[str, Any]: Raw pytest result from the worker
+        """
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError("No grading worker became available")
+
+        try:
+            result = worker.run(job, job_timeout)
+        except WorkerTimeoutError:
+            if worker.is_alive():
+                self._idle.put(worker)
+            else:
+                self._retire_worker(worker)
+            raise
+        except WorkerCrashedError:
+            self.crashed += 1
+            self._retire_worker(worker)
+            raise
+
+        if not worker.is_alive():
+            self.crashed += 1
+            self._retire_worker(worker)
+        elif result.pop("recycle", False) or worker.jobs_done >= self.max_jobs:
+            self.recycled += 1
+            self._retire_worker(worker)
+        else:
+            self._idle.put(worker)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """Get pool counters."""
+        with self._lock:
+            workers = len(self._workers)
+        return {
+            "workers": workers,
+            "idle": self._idle.qsize(),
+            "recycled": self.recycled,
+            "crashed": self.crashed,
+        }
+
+    def pids(self) -> List[int]:
+        """Get the process IDs of the current workers."""
+        with self._lock:
+            return [worker.process.pid for worker in self._workers]
+
+    def shutdown(self):
+        """Stop all workers."""
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.close()
+
+
+_pool: Optional[WorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> WorkerPool:
+    """
+    Get the process-wide worker pool, starting it on first use.
+
+    Returns:
+        WorkerPool: Shared pool of warm grading workers
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def exercise_test_imports(exercises_dir: Path) -> List[str]:
+    """
+    Find the top-level modules imported by the bundled exercise tests.
+
+    Args:
+        exercises_dir (Path): Directory holding one folder per exercise
+
+    Returns:
+        List[str]: Module names, without the submission's own module
+    """
+    modules = set()
+    for test_file in sorted(exercises_dir.glob("*/test.py")):
+        try:
+            tree = ast.parse(test_file.read_text(encoding="utf-8"))
+        except (OSError, SyntaxError) as e:
+            print(f"Error reading {test_file}: {str(e)}")
+            continue
+        for node in tree.body:
+            if isinstance(node, ast.Import):
+                modules.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                modules.add(node.module)
+    modules.discard("exercise")
+    return sorted(modules)
+
+
+class ForkServer:
+    """Client for the fork server process, shared by all grading threads."""
+
+    def __init__(self, preload: Optional[List[str]] = None):
+        self.preload = list(preload or [])
+        self.process: Optional[subprocess.Popen] = None
+        self._ids = itertools.count(1)
+        self._waiting: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.forks = 0
+        self.crashed = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    def _start(self):
+        """Start the server and wait until it is ready. Caller holds the lock."""
+        process = subprocess.Popen(
+            [sys.executable, "-B", str(FORK_SERVER_SCRIPT), json.dumps(self.preload)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        if not process.stdout.readline():
+            process.wait()
+            raise WorkerCrashedError(
+                f"Fork server exited with code {process.returncode}",
+                process.returncode,
+            )
+        if self.process is not None:
+            self.restarts += 1
+        self.process = process
+        threading.Thread(
+            target=self._read_messages, args=(process,), daemon=True
+        ).start()
+
+    def _read_messages(self, process: subprocess.Popen):
+        """Hand each status message to the thread waiting for that job."""
+        for line in process.stdout:
+            message = json.loads(line)
+            with self._lock:
+                waiter = self._waiting.pop(message["id"], None)
+            if waiter is not None:
+                waiter["message"] = message
+                waiter["event"].set()
+
+        # The server is gone; fail every job it still owed a result
+        with self._lock:
+            lost = [
+                job_id
+                for job_id, waiter in self._waiting.items()
+                if waiter["process"] is process
+            ]
+            waiters = [self._waiting.pop(job_id) for job_id in lost]
+        for waiter in waiters:
+            waiter["event"].set()
+
+    def run(
+        self, job: Dict[str, Any], job_timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Grade a job in a freshly forked child.
+
+        Args:
+            job (Dict[str, Any]): Job description, see grading_worker.run_job
+            job_timeout (Optional[float]): Wall-clock seconds the job may run
+
+        Returns:
+            Dict[str, Any]: Raw pytest result from the child
+        """
+        workspace = os.path.dirname(job["test_file"])
+        job = dict(
+            job,
+            id=next(self._ids),
+            result_file=os.path.join(workspace, "grading-result.json"),
+        )
+        if job_timeout:
+            job["limits"] = dict(job.get("limits") or {}, wallTime=job_timeout)
+        waiter = {"event": threading.Event(), "message": None}
+
+        with self._lock:
+            if self.process is None or self.process.poll() is not None:
+                self._start()
+            waiter["process"] = self.process
+            self._waiting[job["id"]] = waiter
+            try:
+                self.process.stdin.write(json.dumps(job) + "\n")
+                self.process.stdin.flush()
+            except (OSError, ValueError) as e:
+                self._waiting.pop(job["id"], None)
+                self.crashed += 1
+                raise WorkerCrashedError(str(e)) from e
+            self.forks += 1
+
+        wait = job_timeout + FORK_SERVER_GRACE if job_timeout else None
+        if not waiter["event"].wait(wait):
+            with self._lock:
+                self._waiting.pop(job["id"], None)
+            raise WorkerTimeoutError(f"Fork server did not answer within {wait:g}s")
+
+        message = waiter["message"]
+        if message is None:
+            self.crashed += 1
+            raise WorkerCrashedError("Fork server exited")
+        if message["status"] == "timeout":
+            self.timeouts += 1
+            raise WorkerTimeoutError(f"Job exceeded {job_timeout:g}s wall time")
+        if message["status"] != "done":
+            self.crashed += 1
+            raise WorkerCrashedError(
+                f"Grading child exited with code {message.get('returncode')}",
+                message.get("returncode"),
+            )
+
+        with open(job["result_file"], "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def stats(self) -> Dict[str, int]:
+        """Get fork server counters."""
+        return {
+            "forks": self.forks,
+            "crashed": self.crashed,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+        }
+
+    def pids(self) -> List[int]:
+        """Get the process ID of the server, if it is running."""
+        process = self.process
+        return [process.pid] if process is not None else []
+
+    def shutdown(self):
+        """Stop the server once its running children have finished."""
+        with self._lock:
+            process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=2)
+        except Exception:
+            process.kill()
+            process.wait()
+
+
+_fork_server: Optional[ForkServer] = None
+
+
+def get_fork_server() -> ForkServer:
+    """
+    Get the process-wide fork server client, preloading the modules the
+    bundled exercise tests import.
+
+    Returns:
+        ForkServer: Shared fork server
+    """
+    global _fork_server
+    with _pool_lock:
+        if _fork_server is None:
+            from utils.course_loader import EXERCISES_DIR
+
+            _fork_server = ForkServer(exercise_test_imports(EXERCISES_DIR))
+            atexit.register(_fork_server.shutdown)
+        return _fork_server
@@ -0,0 +1,209 @@
+"""
+Background grading queue.
+
+Pages submit a grading job and get a job ID back immediately, then poll the
+job on later reruns instead of blocking the Streamlit script thread until
+pytest finishes. A fixed number of grader threads caps how many jobs run at
+once across all sessions.
+"""
+
+import itertools
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from utils.exercise_runner import test_exercise
+
+# Maximum number of submissions graded at the same time
+GRADING_MAX_CONCURRENCY = int(os.environ.get("GRADING_MAX_CONCURRENCY", "4"))
+# Maximum number of submissions waiting or running before new ones are refused
+GRADING_MAX_PENDING = int(os.environ.get("GRADING_MAX_PENDING", "200"))
+# Seconds a finished job is kept around for polling
+GRADING_JOB_TTL = float(os.environ.get("GRADING_JOB_TTL", "600"))
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+UNKNOWN = "unknown"
+
+
+class GradingQueue:
+    """Thread-pool backed queue of grading jobs with submit/poll/cancel."""
+
+    def __init__(
+        self,
+        max_concurrency: int = GRADING_MAX_CONCURRENCY,
+        max_pending: int = GRADING_MAX_PENDING,
+        job_ttl: float = GRADING_JOB_TTL,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_pending = max(1, max_pending)
+        self.job_ttl = job_ttl
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="grader"
+        )
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _run(
+        self,
+        job: Dict[str, Any],
+        exercise_content: bytes,
+        test_content: bytes,
+        limits: Optional[Dict[str, Any]],
+        runner: Optional[str],
+    ):
+        with self._lock:
+            job["state"] = RUNNING
+            job["started"] = time.time()
+        return test_exercise(exercise_content, test_content, limits, runner)
+
+    def _on_done(self, job: Dict[str, Any], future: Future):
+        with self._lock:
+            job["finished"] = time.time()
+            if future.cancelled():
+                job["state"] = CANCELLED
+            elif future.exception() is not None:
+                job["state"] = FAILED
+                job["error"] = str(future.exception())
+            else:
+                job["state"] = DONE
+                job["result"] = future.result()
+
+    def _prune(self):
+        """Forget finished jobs nobody polled within the TTL."""
+        cutoff = time.time() - self.job_ttl
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.get("finished") and job["finished"] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(
+        self,
+        exercise_content: bytes,
+        test_content: bytes,
+        limits: Optional[Dict[str, Any]] = None,
+        runner: Optional[str] = None,
+    ) -> Tuple[bool, str, Optional[str]]:
+        """
+        Queue a submission for grading.
+
+        Args:
+            exercise_content (bytes): Submitted Python file content
+            test_content (bytes): Test file content
+            limits (Optional[Dict[str, Any]]): Per-exercise resource limits
+            runner (Optional[str]): Per-exercise runner, e.g. "inline"
+
+        Returns:
+            Tuple[bool, str, Optional[str]]:
+                - Success status (bool)
+                - Message (str)
+                - Job ID if queued, None otherwise
+        """
+        with self._lock:
+            self._prune()
+            pending = sum(
+                1 for job in self._jobs.values() if job["state"] in (QUEUED, RUNNING)
+            )
+            if pending >= self.max_pending:
+                return False, "The grader is busy, please try again shortly", None
+
+            job_id = uuid.uuid4().hex
+            job = {
+                "id": job_id,
+                "state": QUEUED,
+                "sequence": next(self._sequence),
+                "submitted": time.time(),
+            }
+            self._jobs[job_id] = job
+
+        future = self._executor.submit(
+            self._run, job, exercise_content, test_content, limits, runner
+        )
+        job["future"] = future
+        future.add_done_callback(lambda f: self._on_done(job, f))
+        return True, "Submission queued for grading", job_id
+
+    def poll(self, job_id: str) -> Dict[str, Any]:
+        """
+        Get the current state of a job.
+
+        Args:
+            job_id (str): ID returned by submit
+
+        Returns:
+            Dict[str, Any]: "state", plus "position" while queued, "elapsed"
+            seconds, and "result" (a GradingResult) once done
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return {"state": UNKNOWN}
+
+            status = {
+                "state": job["state"],
+                "elapsed": job.get("finished", time.time()) - job["submitted"],
+            }
+            if job["state"] == QUEUED:
+                status["position"] = sum(
+                    1
+                    for other in self._jobs.values()
+                    if other["state"] == QUEUED and other["sequence"] < job["sequence"]
+                )
+            elif job["state"] == DONE:
+                status["result"] = job["result"]
+            elif job["state"] == FAILED:
+                status["error"] = job.get("error")
+            return status
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job that has not started running yet.
+
+        Args:
+            job_id (str): ID returned by submit
+
+        Returns:
+            bool: True if the job was cancelled
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or "future" not in job:
+            return False
+        return job["future"].cancel()
+
+    def stats(self) -> Dict[str, int]:
+        """Get the number of jobs in each state."""
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0, CANCELLED: 0}
+            for job in self._jobs.values():
+                counts[job["state"]] += 1
+            return counts
+
+
+_queue: Optional[GradingQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_grading_queue() -> GradingQueue:
+    """
+    Get the process-wide grading queue.
+
+    Returns:
+        GradingQueue: Queue shared by all sessions
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = GradingQueue()
+        return _queue
@@ -0,0 +1,213 @@
+"""
+Long-lived grading worker process.
+
+Started by utils/grading_pool.py. pytest is imported (and warmed up with a
+throwaway session) once at startup; after that the worker reads one JSON job
+per line from stdin and writes one JSON result per line to the original
+stdout. Each job runs pytest in a child forked from the warm worker, so
+whatever a submission changes in the interpreter (patched modules, builtins,
+pytest internals) dies with the child and cannot affect later jobs. Where
+fork() is not available the job runs in the worker itself, and the result
+asks the pool to replace the worker.
+"""
+
+import contextlib
+import gc
+import io
+import json
+import os
+import select
+import signal
+import sys
+import tempfile
+import time
+from typing import Dict, Any, Optional
+
+import pytest
+
+from grading_limits import apply_limits, restore_limits, truncate_output
+from grading_plugin import ResultCollector, GRADING_PYTEST_ARGS
+
+WARM_UP_TEST = "def test_warm_up():\n    assert True\n"
+
+
+def _purge_workspace_modules(workspace: str):
+    """
+    Drop modules imported from a job's workspace so the next job starts clean.
+
+    Args:
+        workspace (str): Directory holding the exercise and test files
+    """
+    prefix = os.path.join(workspace, "")
+    for name, module in list(sys.modules.items()):
+        module_file = getattr(module, "__file__", None) or ""
+        if module_file and os.path.abspath(module_file).startswith(prefix):
+            del sys.modules[name]
+
+
+def run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run pytest in-process for a single job.
+
+    Args:
+        job (Dict[str, Any]): Job with the absolute "test_file" path and
+            optional resource "limits"
+
+    Returns:
+        Dict[str, Any]: pytest "returncode", per-test records in "tests" and
+        any stray "stdout" and "stderr"
+    """
+    test_file = job["test_file"]
+    limits = job.get("limits") or {}
+    workspace = os.path.dirname(os.path.abspath(test_file))
+
+    saved_path = list(sys.path)
+    saved_cwd = os.getcwd()
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    collector = ResultCollector()
+
+    saved_limits = apply_limits(limits)
+    try:
+        # Relative paths the submission writes stay in its workspace
+        os.chdir(workspace)
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            returncode = int(
+                pytest.main(
+                    [test_file, f"--rootdir={workspace}", *GRADING_PYTEST_ARGS],
+                    plugins=[collector],
+                )
+            )
+    except BaseException as e:
+        returncode = -1
+        stderr.write(f"Worker error: {str(e)}\n")
+    finally:
+        restore_limits(saved_limits)
+        # Undo whatever the test file did to the interpreter state
+        sys.path[:] = saved_path
+        os.chdir(saved_cwd)
+        _purge_workspace_modules(workspace)
+
+    max_output = limits.get("maxOutputBytes", 0)
+    return {
+        "returncode": returncode,
+        "tests": collector.tests,
+        "stdout": truncate_output(stdout.getvalue(), max_output),
+        "stderr": truncate_output(stderr.getvalue(), max_output),
+    }
+
+
+def _read_child_result(read_fd: int, deadline: Optional[float]) -> Optional[str]:
+    """Read everything a child writes to its pipe; None if the deadline passes."""
+    chunks = []
+    while True:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            ready, _, _ = select.select([read_fd], [], [], remaining)
+            if not ready:
+                return None
+        data = os.read(read_fd, 65536)
+        if not data:
+            return b"".join(chunks).decode("utf-8")
+        chunks.append(data)
+
+
+def run_job_forked(job: Dict[str, Any], protocol) -> Dict[str, Any]:
+    """
+    Run a job in a child forked from this worker.
+
+    The child is killed when it runs past the job's wall time.
+
+    Args:
+        job (Dict[str, Any]): Job, see run_job
+        protocol: The worker's protocol stream, closed in the child
+
+    Returns:
+        Dict[str, Any]: Result of run_job, {"timeout": True} if the wall
+        time ran out, or the exit status of a child that died
+    """
+    wall_time = (job.get("limits") or {}).get("wallTime")
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        protocol.close()
+        exitcode = 0
+        try:
+            result = run_job(job)
+            with os.fdopen(write_fd, "w", encoding="utf-8") as f:
+                json.dump(result, f)
+        except BaseException as e:
+            print(f"Error in grading child: {str(e)}", file=sys.stderr)
+            exitcode = 70
+        finally:
+            # Skip atexit handlers and buffers inherited from the worker
+            os._exit(exitcode)
+
+    os.close(write_fd)
+    try:
+        deadline = time.monotonic() + wall_time if wall_time else None
+        output = _read_child_result(read_fd, deadline)
+    finally:
+        os.close(read_fd)
+    if output is None:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        os.waitpid(pid, 0)
+        return {"timeout": True}
+
+    _, status = os.waitpid(pid, 0)
+    if os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0 and output:
+        return json.loads(output)
+    returncode = (
+        -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    )
+    return {
+        "returncode": returncode,
+        "stderr": f"Grading process exited with code {returncode}",
+    }
+
+
+def warm_up():
+    """
+    Run a throwaway pytest session so lazily imported plugins are loaded.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_file = os.path.join(temp_dir, "test_warm_up.py")
+        with open(test_file, "w", encoding="utf-8") as f:
+            f.write(WARM_UP_TEST)
+        run_job({"test_file": test_file})
+
+
+def main():
+    # Keep the real stdout for the job protocol and point fd 1 at /dev/null,
+    # so anything a submission writes straight to the fd cannot corrupt it.
+    protocol = os.fdopen(os.dup(1), "w", encoding="utf-8", buffering=1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    warm_up()
+    if hasattr(os, "fork"):
+        # Keep the warm interpreter out of the collector's reach, so the
+        # children's garbage collections do not un-share its pages
+        gc.freeze()
+    protocol.write(json.dumps({"ready": True}) + "\n")
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        job = json.loads(line)
+        if hasattr(os, "fork"):
+            result = run_job_forked(job, protocol)
+        else:
+            result = dict(run_job(job), recycle=True)
+        protocol.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Pooled HTTP client for calls to external services.
+
+One requests.Session per service keeps connections alive between calls, so
+a burst of logins (e.g. at the start of a class) pays TCP and TLS setup once
+per pooled connection instead of once per login. Every call gets explicit
+connect and read timeouts, transient failures are retried with jittered
+backoff, and latencies are recorded for stats().
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connections kept alive per host
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "20"))
+# Seconds to establish a connection, and to wait for the response
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "10"))
+# Retries after a transient failure, and the delay before the first one
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "2"))
+HTTP_RETRY_DELAY = float(os.environ.get("HTTP_RETRY_DELAY", "0.2"))
+
+# Responses worth retrying: rate limiting and server-side trouble
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Latencies kept for the percentiles in stats()
+LATENCY_SAMPLES = 1000
+
+
+class HttpClient:
+    """Thread-safe pooled session with timeouts, retries and latency metrics."""
+
+    def __init__(
+        self,
+        name: str,
+        pool_size: int = HTTP_POOL_SIZE,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = HTTP_READ_TIMEOUT,
+        retries: int = HTTP_RETRIES,
+        retry_delay: float = HTTP_RETRY_DELAY,
+    ):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = max(0, retries)
+        self.retry_delay = retry_delay
+
+        self.session = requests.Session()
+        # Retries are handled in post(), with jitter and metrics
+        adapter = HTTPAdapter(
+            pool_connections=4, pool_maxsize=max(1, pool_size), max_retries=0
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._latencies: "deque[float]" = deque(maxlen=LATENCY_SAMPLES)
+        self._stats = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0}
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]):
+        """Sleep before a retry: full jitter, or the server's Retry-After."""
+        delay = random.uniform(0, self.retry_delay * 2**attempt)
+        if response is not None:
+            try:
+                delay = max(delay, float(response.headers.get("Retry-After", 0)))
+            except ValueError:
+                pass
+        time.sleep(min(delay, self.timeout[1]))
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        """
+        POST through the pool, retrying transient failures.
+
+        Only use it for requests that are safe to repeat.
+
+        Args:
+            url (str): Request URL
+            **kwargs: Passed to requests.Session.post (e.g. json=...)
+
+        Returns:
+            requests.Response: The last response, possibly a retryable error
+            status if every attempt failed
+
+        Raises:
+            requests.exceptions.RequestException: If no attempt got a response
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    with self._lock:
+                        self._stats["retries"] += 1
+                with self._lock:
+                    self._stats["attempts"] += 1
+
+                response = None
+                try:
+                    response = self.session.post(url, **kwargs)
+                except (
+                    requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout,
+                ):
+                    if attempt == self.retries:
+                        raise
+                else:
+                    if (
+                        response.status_code not in RETRY_STATUSES
+                        or attempt == self.retries
+                    ):
+                        return response
+                self._backoff(attempt, response)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._stats["failures"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._stats["calls"] += 1
+                self._latencies.append(time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get call counters and latency percentiles.
+
+        Returns:
+            Dict[str, Any]: Calls, attempts, retries and calls that failed
+            without a response, plus p50/p95/p99/max latency in milliseconds
+            (retries included) over the most recent calls
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats: Dict[str, Any] = dict(self._stats, name=self.name)
+
+        def percentile(pct: float) -> Optional[float]:
+            if not latencies:
+                return None
+            index = min(len(latencies) - 1, int(pct / 100 * len(latencies)))
+            return round(latencies[index] * 1000, 1)
+
+        stats["latency_ms"] = {
+            "p50": percentile(50),
+            "p95": percentile(95),
+            "p99": percentile(99),
+            "max": round(latencies[-1] * 1000, 1) if latencies else None,
+        }
+        return stats
+
+    def close(self):
+        """Close the pooled connections."""
+        self.session.close()
@@ -0,0 +1,512 @@
+"""
+In-process test runner for trusted, simple exercise tests.
+
+Registers the submission as the `exercise` module, executes the test file
+and calls its test functions directly, without starting pytest. It supports
+what the bundled exercise tests use: plain asserts, pytest.raises,
+function-scoped fixtures (including generator fixtures, tmp_path and
+monkeypatch), autouse fixtures, parametrize and skip/skipif marks.
+
+There is no process isolation, so only exercises whose metadata opts in with
+"runner": "inline" are graded this way. The only limit is wall time: a run
+that goes over it is interrupted and reported as a timeout. A run that
+cannot be interrupted (e.g. blocked in a C call) keeps the runner, and
+later submissions fall back to the resource-limited runners.
+"""
+
+import ctypes
+import inspect
+import io
+import itertools
+import linecache
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import types
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import pytest
+
+from utils.grading_plugin import MAX_FIELD_CHARS
+
+EXERCISE_MODULE = "exercise"
+TEST_MODULE = "test_exercise"
+
+# Seconds a run that went over its wall time gets to stop after being
+# interrupted
+INLINE_STOP_GRACE = float(os.environ.get("GRADING_INLINE_STOP_GRACE", "1"))
+
+# sys.modules, sys.path and the standard streams are process-wide. Held by
+# the thread running the tests, and released when that thread is done
+_inline_lock = threading.Lock()
+_run_ids = itertools.count()
+
+# The last run that could not be interrupted, while it may still hold the lock
+_stuck_run: Optional["_InlineRun"] = None
+
+
+class InlineBusyError(RuntimeError):
+    """Raised when the inline runner is still held by a run that did not stop."""
+
+
+class _WallTimeExceeded(BaseException):
+    """Raised inside a run that went over its wall time."""
+
+
+class _ThreadCapture(io.TextIOBase):
+    """Stream that captures writes from one thread and passes the rest on."""
+
+    def __init__(self, original, thread_id: int):
+        self.original = original
+        self.thread_id = thread_id
+        self.buffer = io.StringIO()
+
+    def write(self, text: str) -> int:
+        if threading.get_ident() == self.thread_id:
+            return self.buffer.write(text)
+        return self.original.write(text)
+
+    def flush(self):
+        self.original.flush()
+
+    def take(self) -> str:
+        """Return and reset what has been captured so far."""
+        value = self.buffer.getvalue()
+        self.buffer = io.StringIO()
+        return value
+
+
+def _truncate(text: str) -> str:
+    if len(text) <= MAX_FIELD_CHARS:
+        return text
+    return text[:MAX_FIELD_CHARS] + "\n[truncated]"
+
+
+def _exception_message(error: BaseException) -> str:
+    """Format an exception like pytest's one-line crash message."""
+    return "".join(traceback.format_exception_only(type(error), error)).strip()
+
+
+def _compile_into(module: types.ModuleType, code: str, filename: str):
+    """Execute source in a module, keeping it visible to inspect.getsource."""
+    linecache.cache[filename] = (
+        len(code),
+        None,
+        code.splitlines(keepends=True),
+        filename,
+    )
+    exec(compile(code, filename, "exec"), module.__dict__)
+
+
+def _as_fixture(name: str, obj: Any) -> Optional[Tuple[str, Callable, bool]]:
+    """
+    Unwrap a @pytest.fixture object.
+
+    Returns:
+        Optional[Tuple[str, Callable, bool]]: (fixture name, function,
+        autouse) if obj is a fixture, None otherwise
+    """
+    # pytest >= 8.4 wraps fixtures in FixtureFunctionDefinition, older
+    # versions mark the function itself
+    marker = getattr(obj, "_fixture_function_marker", None) or getattr(
+        obj, "_pytestfixturefunction", None
+    )
+    if marker is None:
+        return None
+    function = getattr(obj, "_fixture_function", None)
+    if function is None:
+        function = obj.__pytest_wrapped__.obj
+    return marker.name or name, function, bool(marker.autouse)
+
+
+def _marks(function: Callable, name: str) -> List[Any]:
+    return [mark for mark in getattr(function, "pytestmark", []) if mark.name == name]
+
+
+def _expand_parametrize(
+    function: Callable,
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Expand parametrize marks into (id suffix, arguments) cases.
+
+    Stacked parametrize marks produce their cartesian product, like pytest.
+    """
+    cases = [("", {})]
+    for mark in reversed(_marks(function, "parametrize")):
+        argnames, argvalues = mark.args[0], mark.args[1]
+        if isinstance(argnames, str):
+            argnames = [name.strip() for name in argnames.split(",") if name.strip()]
+        ids = mark.kwargs.get("ids")
+
+        expanded = []
+        for suffix, arguments in cases:
+            for index, values in enumerate(argvalues):
+                if len(argnames) == 1:
+                    values = (values,)
+                case_id = str(ids[index]) if ids else "-".join(map(str, values))
+                merged = dict(arguments, **dict(zip(argnames, values)))
+                expanded.append((f"{suffix}-{case_id}" if suffix else case_id, merged))
+        cases = expanded
+    return cases
+
+
+def _skip_reason(function: Callable) -> Optional[str]:
+    for mark in _marks(function, "skip"):
+        return mark.kwargs.get("reason", mark.args[0] if mark.args else "skipped")
+    for mark in _marks(function, "skipif"):
+        if mark.args and mark.args[0]:
+            return mark.kwargs.get("reason", "condition true")
+    return None
+
+
+class _FixtureScope:
+    """Resolves function-scoped fixtures for one test and tears them down."""
+
+    def __init__(self, fixtures: Dict[str, Callable]):
+        self.fixtures = fixtures
+        self.values: Dict[str, Any] = {}
+        self.finalizers: List[Callable[[], None]] = []
+
+    def get(self, name: str) -> Any:
+        if name in self.values:
+            return self.values[name]
+
+        if name in self.fixtures:
+            value = self.call(self.fixtures[name])
+        elif name == "tmp_path":
+            path = tempfile.mkdtemp(prefix="inline-")
+            self.finalizers.append(lambda: shutil.rmtree(path, ignore_errors=True))
+            value = Path(path)
+        elif name == "monkeypatch":
+            value = pytest.MonkeyPatch()
+            self.finalizers.append(value.undo)
+        else:
+            raise LookupError(f"fixture '{name}' not found")
+
+        self.values[name] = value
+        return value
+
+    def call(self, function: Callable, **arguments) -> Any:
+        """Call a function, filling its remaining parameters with fixtures."""
+        for parameter in inspect.signature(function).parameters:
+            if parameter not in arguments:
+                arguments[parameter] = self.get(parameter)
+
+        result = function(**arguments)
+        if inspect.isgenerator(result):
+            value = next(result)
+            self.finalizers.append(lambda: next(result, None))
+            return value
+        return result
+
+    def teardown(self):
+        while self.finalizers:
+            self.finalizers.pop()()
+
+
+def _collect(
+    namespace: Dict[str, Any], module_name: str
+) -> Tuple[Dict[str, Callable], List[str], List[Tuple[str, Callable]]]:
+    """Find fixtures, autouse fixture names and test callables in a module."""
+    fixtures = {}
+    autouse = []
+    tests = []
+
+    for name, obj in list(namespace.items()):
+        fixture = _as_fixture(name, obj)
+        if fixture is not None:
+            fixture_name, function, is_autouse = fixture
+            fixtures[fixture_name] = function
+            if is_autouse:
+                autouse.append(fixture_name)
+        elif name.startswith("test") and inspect.isfunction(obj):
+            tests.append((f"{module_name}.py::{name}", obj))
+        elif (
+            name.startswith("Test")
+            and inspect.isclass(obj)
+            and getattr(obj, "__module__", None) == module_name
+            and "__init__" not in vars(obj)
+        ):
+            for method_name in dir(obj):
+                if method_name.startswith("test"):
+                    tests.append(
+                        (
+                            f"{module_name}.py::{name}::{method_name}",
+                            getattr(obj(), method_name),
+                        )
+                    )
+
+    return fixtures, autouse, tests
+
+
+def _run_test(
+    nodeid: str,
+    function: Callable,
+    arguments: Dict[str, Any],
+    fixtures: Dict[str, Callable],
+    autouse: List[str],
+    capture: _ThreadCapture,
+) -> Dict[str, Any]:
+    """Run a single test case and return its record."""
+    record = {
+        "nodeid": nodeid,
+        "outcome": "passed",
+        "duration": 0.0,
+        "message": "",
+        "output": "",
+    }
+    scope = _FixtureScope(fixtures)
+    started = time.perf_counter()
+
+    try:
+        for name in autouse:
+            scope.get(name)
+    except BaseException as e:
+        if isinstance(e, (KeyboardInterrupt, _WallTimeExceeded)):
+            raise
+        record["outcome"] = "error"
+        record["message"] = _exception_message(e)
+    else:
+        try:
+            scope.call(function, **arguments)
+        except pytest.skip.Exception as e:
+            record["outcome"] = "skipped"
+            record["message"] = str(e.msg)
+        except pytest.fail.Exception as e:
+            record["outcome"] = "failed"
+            record["message"] = f"Failed: {e.msg}"
+        except LookupError as e:
+            # Unknown fixture, reported as a setup error like pytest does
+            record["outcome"] = "error"
+            record["message"] = str(e)
+        except BaseException as e:
+            if isinstance(e, (KeyboardInterrupt, _WallTimeExceeded)):
+                raise
+            record["outcome"] = "failed"
+            record["message"] = _exception_message(e)
+
+    try:
+        scope.teardown()
+    except BaseException as e:
+        if isinstance(e, (KeyboardInterrupt, _WallTimeExceeded)):
+            raise
+        if record["outcome"] == "passed":
+            record["outcome"] = "error"
+            record["message"] = _exception_message(e)
+
+    record["duration"] = time.perf_counter() - started
+    record["message"] = _truncate(record["message"])
+    record["output"] = _truncate(capture.take())
+    return record
+
+
+class _InlineRun:
+    """One run on its own thread, which holds _inline_lock until it is done."""
+
+    def __init__(self, exercise_code: str, test_code: str):
+        self.exercise_code = exercise_code
+        self.test_code = test_code
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+        self.thread = threading.Thread(
+            target=self._main, name="inline-grader", daemon=True
+        )
+        self._interruptible = True
+        self._interrupt_lock = threading.Lock()
+
+    def _main(self):
+        try:
+            self.result = _run(self.exercise_code, self.test_code, self)
+        except _WallTimeExceeded:
+            pass
+        except BaseException as e:
+            self.error = e
+        finally:
+            _inline_lock.release()
+
+    def interrupt(self):
+        """Raise _WallTimeExceeded in the run's thread, unless it is cleaning up."""
+        with self._interrupt_lock:
+            if self._interruptible:
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                    ctypes.c_ulong(self.thread.ident),
+                    ctypes.py_object(_WallTimeExceeded),
+                )
+
+    def stop_interrupting(self):
+        with self._interrupt_lock:
+            self._interruptible = False
+
+
+def _restore(
+    saved: Dict[str, Any], known_modules: Set[str], filenames: Tuple[str, str]
+):
+    """Put back the process-wide state a run changed."""
+    sys.stdout, sys.stderr = saved["streams"]
+    sys.path[:] = saved["path"]
+    os.chdir(saved["cwd"])
+    for name, module in saved["modules"].items():
+        if module is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = module
+    # Drop modules the submission created on the fly; real imports from disk
+    # stay cached, as they would in any other session
+    for name in set(sys.modules) - known_modules:
+        if getattr(sys.modules.get(name), "__spec__", None) is None:
+            sys.modules.pop(name, None)
+    for filename in filenames:
+        linecache.cache.pop(filename, None)
+
+
+def run_tests_inline(
+    exercise_code: str, test_code: str, wall_time: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Grade a submission in-process.
+
+    Args:
+        exercise_code (str): Submitted Python code
+        test_code (str): Test file code
+        wall_time (Optional[float]): Seconds before the run is interrupted,
+            None for no limit
+
+    Returns:
+        Dict[str, Any]: Raw run record in the same shape the subprocess and
+        pool executors produce ("returncode", "tests", "stdout", "stderr")
+
+    Raises:
+        TimeoutError: If the run went over its wall time
+        InlineBusyError: If an earlier run that could not be interrupted
+            still holds the runner
+    """
+    global _stuck_run
+
+    # Do not queue behind a run that is known not to stop
+    stuck = _stuck_run
+    if stuck is not None and stuck.thread.is_alive():
+        raise InlineBusyError("Inline runner is held by a run that did not stop")
+
+    # Runs are serialized, so wait for the one ahead to finish or time out
+    wait = -1 if wall_time is None else wall_time + INLINE_STOP_GRACE
+    if not _inline_lock.acquire(timeout=wait):
+        raise InlineBusyError("Inline runner is held by a run that did not stop")
+
+    run = _InlineRun(exercise_code, test_code)
+    try:
+        run.thread.start()
+    except BaseException:
+        _inline_lock.release()
+        raise
+    run.thread.join(wall_time)
+
+    if run.thread.is_alive():
+        # Interrupt it repeatedly, in case the submission catches the first
+        deadline = time.monotonic() + INLINE_STOP_GRACE
+        while run.thread.is_alive() and time.monotonic() < deadline:
+            run.interrupt()
+            run.thread.join(0.05)
+        if run.thread.is_alive():
+            print("Inline grading run did not stop, it keeps the inline runner")
+            _stuck_run = run
+        raise TimeoutError(f"Job exceeded {wall_time:g}s wall time")
+
+    if run.error is not None:
+        raise run.error
+    if run.result is None:
+        # Interrupted right as it finished
+        raise TimeoutError(f"Job exceeded {wall_time:g}s wall time")
+    return run.result
+
+
+def _run(exercise_code: str, test_code: str, run: _InlineRun) -> Dict[str, Any]:
+    """Execute the submission and its tests in the current thread."""
+    run_id = next(_run_ids)
+    exercise_file = f"<{EXERCISE_MODULE}-{run_id}>"
+    test_file = f"<{TEST_MODULE}-{run_id}>"
+
+    saved = {
+        "modules": {
+            name: sys.modules.get(name) for name in (EXERCISE_MODULE, TEST_MODULE)
+        },
+        "path": list(sys.path),
+        "cwd": os.getcwd(),
+        "streams": (sys.stdout, sys.stderr),
+    }
+    known_modules = set(sys.modules)
+    capture = _ThreadCapture(sys.stdout, threading.get_ident())
+    error_capture = _ThreadCapture(sys.stderr, threading.get_ident())
+
+    records = []
+    try:
+        sys.stdout, sys.stderr = capture, error_capture
+        exercise_module = types.ModuleType(EXERCISE_MODULE)
+        exercise_module.__file__ = exercise_file
+        test_module = types.ModuleType(TEST_MODULE)
+        test_module.__file__ = test_file
+        sys.modules[EXERCISE_MODULE] = exercise_module
+        sys.modules[TEST_MODULE] = test_module
+
+        try:
+            _compile_into(exercise_module, exercise_code, exercise_file)
+            _compile_into(test_module, test_code, test_file)
+        except BaseException as e:
+            if isinstance(e, (KeyboardInterrupt, _WallTimeExceeded)):
+                raise
+            records.append(
+                {
+                    "nodeid": f"{TEST_MODULE}.py",
+                    "outcome": "error",
+                    "duration": 0.0,
+                    "message": _truncate(f"{type(e).__name__}: {e}"),
+                    "output": _truncate(capture.take()),
+                }
+            )
+            return {"returncode": 2, "tests": records, "stderr": ""}
+
+        fixtures, autouse, tests = _collect(test_module.__dict__, TEST_MODULE)
+        for nodeid, function in tests:
+            reason = _skip_reason(function)
+            for suffix, arguments in _expand_parametrize(function):
+                case_id = f"{nodeid}[{suffix}]" if suffix else nodeid
+                if reason is not None:
+                    records.append(
+                        {
+                            "nodeid": case_id,
+                            "outcome": "skipped",
+                            "duration": 0.0,
+                            "message": reason,
+                            "output": "",
+                        }
+                    )
+                    continue
+                records.append(
+                    _run_test(case_id, function, arguments, fixtures, autouse, capture)
+                )
+    finally:
+        # The watchdog may interrupt this clean-up once more, so retry it
+        while True:
+            try:
+                run.stop_interrupting()
+                _restore(saved, known_modules, (exercise_file, test_file))
+                break
+            except _WallTimeExceeded:
+                pass
+
+    if not records:
+        returncode = 5
+    elif all(record["outcome"] in ("passed", "skipped") for record in records):
+        returncode = 0
+    else:
+        returncode = 1
+
+    return {
+        "returncode": returncode,
+        "tests": records,
+        "stderr": _truncate(error_capture.take()),
+    }
@@ -3,7 +3,7 @@ import re
 from pydantic import ValidationError
 
 from models.forms import RegistrationForm
-from utils.firebase import create_user
+from utils.storage import create_user
 
 email_pattern = r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
 
@@ -1,60 +1,322 @@
 import streamlit as st
+import json
 import re
-from pathlib import Path
+from typing import Any, Dict, List
 
+from utils.code_highlight import HIGHLIGHT_VERSION, highlight_code_blocks
+from utils.render_cache import Source, render_cached
 
-def convert_admonitions(markdown_text: str) -> str:
+# Bump whenever a change to the conversion can change its output
+CONVERTER_VERSION = 4
+
+# Docusaurus admonition kinds and how they are shown
+ADMONITIONS = {
+    "info": ("ℹ️", "Info"),
+    "note": ("📝", "Note"),
+    "tip": ("💡", "Tip"),
+    "important": ("❗", "Important"),
+    "warning": ("⚠️", "Warning"),
+    "caution": ("⚠️", "Caution"),
+    "danger": ("🚨", "Danger"),
+}
+
+# Headings of this level or above start a new section of a module
+SECTION_LEVEL = 2
+
+# First characters of lines that may open or close a block
+_BLOCK_MARKERS = frozenset("`~:<")
+_ADMONITION_START = re.compile(r"^\s*:::(\w+)\s*(.*?)\s*$")
+# ":::" on a line of its own, or after the last line of text: "text :::"
+_ADMONITION_END = re.compile(r"^(?:\s*|(.*\S)\s+):::\s*$")
+_DETAILS_START = re.compile(r"^\s*<details>\s*(.*)$")
+_DETAILS_END = re.compile(r"^(.*?)</details>\s*$")
+_SUMMARY = re.compile(r"^\s*<summary>(.*?)</summary>\s*(.*)$")
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)(?:\s+#+)?\s*$")
+_INLINE_TAGS = re.compile(r"</?(?:strong|em)>")
+_INLINE_REPLACEMENTS = {
+    "<strong>": "**",
+    "</strong>": "**",
+    "<em>": "_",
+    "</em>": "_",
+}
+
+
+def _strip_comments(line: str, in_comment: bool):
     """
-    Convert Docusaurus-style admonitions to Streamlit-compatible format
+    Remove HTML comments from a line.
+
+    Returns:
+        Tuple[str, bool]: The line without comments, and whether a comment
+        is still open at its end
     """
-    # Convert :::info blocks
-    markdown_text = re.sub(
-        r":::info\s+(.+?)\s+:::", r"> ℹ️ **Info**: \1", markdown_text, flags=re.DOTALL
-    )
+    out = []
+    position = 0
+    while position <= len(line):
+        if in_comment:
+            end = line.find("-->", position)
+            if end < 0:
+                return "".join(out), True
+            position = end + 3
+            in_comment = False
+        else:
+            start = line.find("<!--", position)
+            if start < 0:
+                out.append(line[position:])
+                break
+            out.append(line[position:start])
+            position = start + 4
+            in_comment = True
+    return "".join(out), in_comment
 
-    # Convert :::warning blocks
-    markdown_text = re.sub(
-        r":::warning\s+(.+?)\s+:::",
-        r"> ⚠️ **Warning**: \1",
-        markdown_text,
-        flags=re.DOTALL,
-    )
 
-    # Convert :::tip blocks
-    markdown_text = re.sub(
-        r":::tip\s+(.+?)\s+:::", r"> 💡 **Tip**: \1", markdown_text, flags=re.DOTALL
+def convert_markdown(content: str) -> str:
+    """
+    Convert markdown text to Streamlit-compatible format
+
+    One walk over the lines handles everything Streamlit's markdown does
+    not support: admonitions (:::info, :::note, :::tip, :::warning,
+    :::danger, ...) become blockquotes, <details> blocks get the blank
+    lines markdown inside them needs, HTML comments are dropped and
+    <strong>/<em> become markdown emphasis. Fenced code is left alone.
+    """
+    out: List[str] = []
+    # Blockquote prefix of the open admonitions, one "> " per level
+    depth = 0
+    prefix = ""
+    details = 0
+    in_comment = False
+    fence = None
+
+    for line in content.split("\n"):
+        # Inside fenced code only the closing fence matters
+        if fence is not None:
+            out.append(prefix + line if line else prefix.rstrip())
+            if line.lstrip().startswith(fence):
+                fence = None
+            continue
+
+        if in_comment or "<!--" in line:
+            had_text = bool(line.strip())
+            line, in_comment = _strip_comments(line, in_comment)
+            if had_text and not line.strip():
+                continue
+
+        stripped = line.lstrip()
+        # Fast path: ordinary text, which is almost every line
+        closes = depth and line.rstrip().endswith(":::")
+        if not closes and (not stripped or stripped[0] not in _BLOCK_MARKERS):
+            # Collapse runs of blank lines, e.g. left behind by comments
+            if not stripped and not depth and out and not out[-1]:
+                continue
+            if "<" in line:
+                line = _INLINE_TAGS.sub(_replace_tag, line)
+            out.append(prefix + line if line else prefix.rstrip())
+            continue
+
+        if stripped.startswith(("```", "~~~")):
+            fence = stripped[:3]
+            out.append(prefix + line)
+            continue
+
+        match = _ADMONITION_START.match(line)
+        if match and match.group(1).lower() in ADMONITIONS:
+            icon, label = ADMONITIONS[match.group(1).lower()]
+            title = match.group(2)
+            # A one-line admonition: ":::tip Text :::"
+            single_line = title.endswith(":::")
+            if single_line:
+                title = title[:-3].rstrip()
+            out.append(
+                f"{prefix}> {icon} **{label}**: {title}"
+                if title
+                else f"{prefix}> {icon} **{label}**"
+            )
+            if not single_line:
+                depth += 1
+                prefix = "> " * depth
+                out.append(prefix.rstrip())
+            continue
+
+        match = _ADMONITION_END.match(line) if depth else None
+        if match:
+            if match.group(1):
+                out.append(prefix + _INLINE_TAGS.sub(_replace_tag, match.group(1)))
+            depth -= 1
+            prefix = "> " * depth
+            out.append(prefix.rstrip())
+            continue
+
+        match = _DETAILS_START.match(line)
+        if match:
+            details += 1
+            out.append(prefix + "<details>")
+            line = match.group(1)
+            if not line.strip():
+                continue
+
+        if details:
+            match = _SUMMARY.match(line)
+            if match:
+                out.append(f"{prefix}<summary>{match.group(1).strip()}</summary>")
+                out.append(prefix.rstrip())
+                line = match.group(2)
+                if not line.strip():
+                    continue
+
+            match = _DETAILS_END.match(line)
+            if match:
+                details -= 1
+                if match.group(1).strip():
+                    out.append(prefix + _INLINE_TAGS.sub(_replace_tag, match.group(1)))
+                out.append(prefix.rstrip())
+                out.append(prefix + "</details>")
+                continue
+
+        if "<" in line:
+            line = _INLINE_TAGS.sub(_replace_tag, line)
+        out.append(prefix + line)
+
+    return "\n".join(out)
+
+
+def convert_markdown_cached(content: Source) -> str:
+    """
+    Convert Docusaurus-style markdown through the shared render cache.
+
+    Fenced code blocks are syntax highlighted as well.
+
+    Args:
+        content (Source): Markdown text, or a handle to a course file
+
+    Returns:
+        str: Converted markdown
+    """
+    return render_cached(
+        content,
+        lambda text: highlight_code_blocks(convert_markdown(text)),
+        "docusaurus",
+        f"{CONVERTER_VERSION}/{HIGHLIGHT_VERSION}",
+        ["highlight"],
     )
 
-    return markdown_text
 
+def _slugify(title: str) -> str:
+    slug = re.sub(r"[^\w\s-]", "", title.lower()).strip()
+    return re.sub(r"[\s_-]+", "-", slug) or "section"
 
-def convert_details(markdown_text: str) -> str:
+
+def split_sections(content: str, level: int = SECTION_LEVEL) -> List[Dict[str, Any]]:
     """
-    Convert HTML details/summary to markdown expandable sections
+    Split markdown into sections at its headings, for a table of contents
+
+    Only top-level headings count, not those inside fenced code (e.g.
+    Python comments), HTML comments, admonitions or details blocks, which
+    are tracked the same way convert_markdown does. Text before the first
+    heading becomes an untitled section of its own.
+
+    Args:
+        content (str): Markdown text
+        level (int): Deepest heading level that starts a section
+
+    Returns:
+        List[Dict[str, Any]]: Sections in order, each with a unique "id"
+        slug, its "title", heading "level" (0 if untitled) and "markdown"
     """
+    sections: List[Dict[str, Any]] = []
+    current = {"id": "intro", "title": "", "level": 0, "lines": []}
+    used = set()
+    depth = 0
+    details = 0
+    in_comment = False
+    fence = None
 
-    def replace_details(match):
-        summary = re.search(r"<summary>(.*?)</summary>", match.group(1)).group(1)
-        content = re.sub(r"<summary>.*?</summary>", "", match.group(1)).strip()
-        return f"\n<details>\n<summary>{summary}</summary>\n\n{content}\n</details>\n"
+    for line in content.split("\n"):
+        if fence is not None:
+            if line.lstrip().startswith(fence):
+                fence = None
+            current["lines"].append(line)
+            continue
 
-    return re.sub(
-        r"<details>(.*?)</details>", replace_details, markdown_text, flags=re.DOTALL
-    )
+        # Only the text outside comments can open or close blocks
+        text = line
+        top_level = not in_comment
+        if in_comment or "<!--" in text:
+            text, in_comment = _strip_comments(text, in_comment)
+        stripped = text.lstrip()
+
+        if stripped.startswith(("```", "~~~")):
+            fence = stripped[:3]
+        elif stripped.startswith(":::"):
+            match = _ADMONITION_START.match(text)
+            if match and match.group(1).lower() in ADMONITIONS:
+                if not match.group(2).endswith(":::"):
+                    depth += 1
+            elif depth and _ADMONITION_END.match(text):
+                depth -= 1
+        elif depth and text.rstrip().endswith(":::"):
+            if _ADMONITION_END.match(text):
+                depth -= 1
+        elif top_level and not depth and not details and text.startswith("#"):
+            match = _HEADING.match(text)
+            if match and len(match.group(1)) <= level:
+                sections.append(current)
+                title = match.group(2)
+                slug = base = _slugify(title)
+                suffix = 1
+                while slug in used:
+                    suffix += 1
+                    slug = f"{base}-{suffix}"
+                used.add(slug)
+                current = {
+                    "id": slug,
+                    "title": title,
+                    "level": len(match.group(1)),
+                    "lines": [],
+                }
+        else:
+            if _DETAILS_START.match(text):
+                details += 1
+            if details and _DETAILS_END.match(text):
+                details -= 1
+        current["lines"].append(line)
+    sections.append(current)
+
+    result = []
+    for section in sections:
+        text = "\n".join(section.pop("lines")).strip("\n")
+        # Drop an empty preamble, keep empty sections that have a heading
+        if text or section["level"]:
+            section["markdown"] = text
+            result.append(section)
+    return result
 
 
-def cleanup_markdown(markdown_text: str) -> str:
+def module_sections(content: Source) -> List[Dict[str, Any]]:
     """
-    Clean up any remaining incompatibilities
+    Split a module into sections through the shared render cache.
+
+    Each section can then be converted with convert_markdown_cached, so
+    lessons are converted and cached one section at a time.
+
+    Args:
+        content (Source): Markdown text, or a handle to a course file
+
+    Returns:
+        List[Dict[str, Any]]: Sections, see split_sections
     """
-    # Remove any HTML comments
-    markdown_text = re.sub(r"<!--.*?-->", "", markdown_text, flags=re.DOTALL)
+    return json.loads(
+        render_cached(
+            content,
+            lambda text: json.dumps(split_sections(text), ensure_ascii=False),
+            "sections",
+            CONVERTER_VERSION,
+            [str(SECTION_LEVEL)],
+        )
+    )
 
-    # Convert HTML tags to markdown where possible
-    markdown_text = markdown_text.replace("<strong>", "**").replace("</strong>", "**")
-    markdown_text = markdown_text.replace("<em>", "_").replace("</em>", "_")
 
-    return markdown_text
+def _replace_tag(match) -> str:
+    return _INLINE_REPLACEMENTS[match.group(0)]
 
 
 def load_and_convert_markdown(file_path: str) -> str:
@@ -64,12 +326,7 @@ def load_and_convert_markdown(file_path: str) -> str:
     with open(file_path, "r", encoding="utf-8") as file:
         content = file.read()
 
-    # Apply conversions
-    content = convert_admonitions(content)
-    content = convert_details(content)
-    content = cleanup_markdown(content)
-
-    return content
+    return convert_markdown(content)
 
 
 def display_markdown_content(filename: str):
@@ -0,0 +1,350 @@
+"""
+Write-behind queue of progress updates.
+
+Pages record a completion and return immediately instead of waiting on a
+Firestore round trip inside the script run. A background thread coalesces
+the completions per user and writes them with mark_completed_many, in one
+batched commit per flush, every PROGRESS_FLUSH_INTERVAL seconds or as soon
+as PROGRESS_FLUSH_SIZE completions are waiting. Failed commits are retried
+with backoff. If a flush still fails (e.g. during a Firestore outage), its
+completions go back into the queue and the next flush waits longer, up to
+PROGRESS_MAX_BACKOFF seconds; they are kept until they are written or the
+process exits, and the queue is drained on exit. Completions of users that
+no longer exist are skipped and logged by the storage backend.
+
+Until a completion is written, apply_overlay adds it to user data read from
+Firestore, so pages show their own writes right away.
+"""
+
+import atexit
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.storage import PROGRESS_FIELDS, mark_completed_many
+from utils.user_cache import invalidate_user
+
+# Set to 0 to write every completion synchronously
+PROGRESS_WRITE_BEHIND = os.environ.get("PROGRESS_WRITE_BEHIND", "1") == "1"
+# Seconds between flushes
+PROGRESS_FLUSH_INTERVAL = float(os.environ.get("PROGRESS_FLUSH_INTERVAL", "2"))
+# Number of waiting completions that triggers a flush right away
+PROGRESS_FLUSH_SIZE = int(os.environ.get("PROGRESS_FLUSH_SIZE", "100"))
+# Attempts per commit, and the delay before the first retry (doubled each time)
+PROGRESS_MAX_ATTEMPTS = int(os.environ.get("PROGRESS_MAX_ATTEMPTS", "4"))
+PROGRESS_RETRY_DELAY = float(os.environ.get("PROGRESS_RETRY_DELAY", "0.5"))
+# Longest wait before retrying a flush that failed every attempt
+PROGRESS_MAX_BACKOFF = float(os.environ.get("PROGRESS_MAX_BACKOFF", "60"))
+# Seconds to wait for the final flush when the process exits
+PROGRESS_DRAIN_TIMEOUT = float(os.environ.get("PROGRESS_DRAIN_TIMEOUT", "10"))
+
+# user ID -> kind ("module" or "exercise") -> item IDs, in completion order
+Completions = Dict[str, Dict[str, List[str]]]
+
+
+def _add(completions: Completions, user_id: str, kind: str, item_id: str) -> bool:
+    items = completions.setdefault(user_id, {}).setdefault(kind, [])
+    if item_id in items:
+        return False
+    items.append(item_id)
+    return True
+
+
+def _flatten(completions: Completions) -> List[Tuple[str, str, str]]:
+    return [
+        (user_id, kind, item_id)
+        for user_id, kinds in completions.items()
+        for kind, items in kinds.items()
+        for item_id in items
+    ]
+
+
+class ProgressQueue:
+    """Coalescing write-behind queue flushed by a background thread."""
+
+    def __init__(
+        self,
+        write: Callable[[List[Tuple[str, str, str]]], bool] = mark_completed_many,
+        flush_interval: float = PROGRESS_FLUSH_INTERVAL,
+        flush_size: int = PROGRESS_FLUSH_SIZE,
+        max_attempts: int = PROGRESS_MAX_ATTEMPTS,
+        retry_delay: float = PROGRESS_RETRY_DELAY,
+        max_backoff: float = PROGRESS_MAX_BACKOFF,
+    ):
+        self.write = write
+        self.flush_interval = flush_interval
+        self.flush_size = max(1, flush_size)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.max_backoff = max_backoff
+        # Waiting for the next flush, and being written by the current one
+        self._pending: Completions = {}
+        self._writing: Completions = {}
+        self._pending_count = 0
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        self._stopping = False
+        # Consecutive failed flushes, and when the next one may start
+        self._failures = 0
+        self._retry_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            "recorded": 0,
+            "coalesced": 0,
+            "flushes": 0,
+            "written": 0,
+            "retries": 0,
+            "failed_flushes": 0,
+            "requeued": 0,
+        }
+
+    def record(self, user_id: str, kind: str, item_id: str) -> bool:
+        """
+        Queue a completion.
+
+        Args:
+            user_id (str): User ID
+            kind (str): "module" or "exercise"
+            item_id (str): Module or exercise ID
+
+        Returns:
+            bool: True once queued; False if the queue has been shut down
+        """
+        if kind not in PROGRESS_FIELDS:
+            raise ValueError(f"Unknown progress kind: {kind}")
+
+        with self._condition:
+            if self._stopping:
+                return False
+            self._stats["recorded"] += 1
+            if not _add(self._pending, user_id, kind, item_id):
+                self._stats["coalesced"] += 1
+                return True
+            self._pending_count += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="progress-writer", daemon=True
+                )
+                self._thread.start()
+            if self._pending_count >= self.flush_size:
+                self._flush_requested = True
+                self._condition.notify_all()
+        return True
+
+    def overlay(self, user_id: str) -> Dict[str, List[str]]:
+        """
+        Get a user's completions that are not written yet.
+
+        Returns:
+            Dict[str, List[str]]: Item IDs by kind
+        """
+        with self._condition:
+            overlay: Dict[str, List[str]] = {}
+            for completions in (self._writing, self._pending):
+                for kind, items in completions.get(user_id, {}).items():
+                    known = overlay.setdefault(kind, [])
+                    known.extend(item for item in items if item not in known)
+            return overlay
+
+    def apply_overlay(self, user_data: Optional[Dict[str, Any]]) -> Optional[Dict]:
+        """
+        Add a user's unwritten completions to user data read from storage.
+
+        Args:
+            user_data (Optional[Dict[str, Any]]): User data with "uid", as
+                returned by get_user_by_id
+
+        Returns:
+            Optional[Dict]: The same data with the completed lists extended
+        """
+        if not user_data or "uid" not in user_data:
+            return user_data
+        for kind, items in self.overlay(user_data["uid"]).items():
+            field = PROGRESS_FIELDS[kind]
+            completed = list(user_data.get(field) or [])
+            completed.extend(item for item in items if item not in completed)
+            user_data[field] = completed
+        return user_data
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Write everything queued so far without waiting for the interval.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait, None to wait until done
+
+        Returns:
+            bool: True if nothing is left to write; False on timeout or if
+            a flush failed and its completions went back into the queue
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            failures = self._stats["failed_flushes"]
+            while self._pending or self._writing:
+                if self._thread is None or not self._thread.is_alive():
+                    return False
+                if self._stats["failed_flushes"] != failures:
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: float = PROGRESS_DRAIN_TIMEOUT) -> bool:
+        """
+        Stop accepting completions and write the ones still queued.
+
+        Args:
+            timeout (float): Seconds to wait for the final flush
+
+        Returns:
+            bool: True if nothing is left in the queue
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._condition:
+            left = len(_flatten(self._pending)) + len(_flatten(self._writing))
+        if left:
+            print(f"Progress queue stopped with {left} completions not written")
+        return not left
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._retry_at is not None:
+                    # Back off after a failed flush, even if one is requested
+                    while not self._stopping and time.monotonic() < self._retry_at:
+                        self._condition.wait(self._retry_at - time.monotonic())
+                elif not self._stopping and not self._flush_requested:
+                    self._condition.wait(self.flush_interval)
+                if not self._pending:
+                    self._flush_requested = False
+                    self._condition.notify_all()
+                    if self._stopping:
+                        return
+                    continue
+                self._writing, self._pending = self._pending, {}
+                self._pending_count = 0
+                self._flush_requested = False
+                batch = self._writing
+
+            written = self._write_batch(batch)
+
+            with self._condition:
+                self._writing = {}
+                self._stats["flushes"] += 1
+                if written:
+                    self._failures = 0
+                    self._retry_at = None
+                else:
+                    self._requeue(batch)
+                    self._failures += 1
+                    delay = min(
+                        self.max_backoff,
+                        self.retry_delay * 2 ** (self.max_attempts + self._failures),
+                    )
+                    self._retry_at = time.monotonic() + random.uniform(delay / 2, delay)
+                self._condition.notify_all()
+                if not written and self._stopping:
+                    # Leave them for shutdown to report
+                    return
+
+    def _requeue(self, batch: Completions):
+        """Put a failed flush back in front of what was queued since."""
+        count = len(_flatten(batch))
+        for user_id, kind, item_id in _flatten(self._pending):
+            _add(batch, user_id, kind, item_id)
+        self._pending = batch
+        self._pending_count = len(_flatten(batch))
+        self._stats["failed_flushes"] += 1
+        self._stats["requeued"] += count
+
+    def _write_batch(self, batch: Completions) -> bool:
+        """Commit one flush, retrying with backoff; whether it was written."""
+        completions = _flatten(batch)
+        if not self._attempt(completions):
+            print(f"Writing {len(completions)} completions failed, keeping them queued")
+            return False
+
+        self._count("written", len(completions))
+        # Cached profiles are dropped while the completions are still in the
+        # overlay, so pages never see a written completion disappear
+        for user_id in batch:
+            invalidate_user(user_id)
+        return True
+
+    def _attempt(self, completions: List[Tuple[str, str, str]]) -> bool:
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self._count("retries", 1)
+                # Exponential backoff with full jitter, cut short on shutdown
+                delay = random.uniform(0, self.retry_delay * 2 ** (attempt - 1))
+                with self._condition:
+                    if self._stopping:
+                        delay = min(delay, self.retry_delay)
+                time.sleep(delay)
+            try:
+                if self.write(completions):
+                    return True
+            except Exception as e:
+                print(f"Error writing progress: {str(e)}")
+        return False
+
+    def _count(self, name: str, amount: int):
+        with self._condition:
+            self._stats[name] += amount
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get queue counters.
+
+        Returns:
+            Dict[str, int]: Completions recorded, coalesced (already queued),
+            written and put back after a failed flush, flushes, failed
+            flushes, retries, and completions waiting
+        """
+        with self._condition:
+            return dict(
+                self._stats,
+                pending=len(_flatten(self._pending)),
+                writing=len(_flatten(self._writing)),
+            )
+
+
+_queue: Optional[ProgressQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_progress_queue() -> Optional[ProgressQueue]:
+    """
+    Get the process-wide progress queue.
+
+    Returns:
+        Optional[ProgressQueue]: Shared queue, or None if write-behind is off
+    """
+    global _queue
+    if not PROGRESS_WRITE_BEHIND:
+        return None
+    with _queue_lock:
+        if _queue is None:
+            _queue = ProgressQueue()
+            # Drain on a normal exit, including Streamlit's SIGTERM handling
+            atexit.register(_queue.shutdown)
+        return _queue
+
+
+def apply_progress_overlay(user_data: Optional[Dict[str, Any]]) -> Optional[Dict]:
+    """
+    Add unwritten completions to user data, see ProgressQueue.apply_overlay.
+    """
+    queue = get_progress_queue()
+    return queue.apply_overlay(user_data) if queue is not None else user_data
@@ -0,0 +1,298 @@
+"""
+Shared cache of rendered markdown.
+
+Module and exercise pages convert their markdown on every Streamlit rerun.
+The cache keys each conversion on a hash of the source, the renderer and its
+version, and the extensions used, so every lesson is converted once per
+deploy instead of once per click per user. Entries live in an in-memory LRU
+bounded by size, optionally backed by a directory on disk that survives
+restarts.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Union
+
+from utils.course_content import ContentHandle
+
+# Cache settings; the disk tier is off unless RENDER_CACHE_DIR is set
+RENDER_CACHE_ENABLED = os.environ.get("RENDER_CACHE_ENABLED", "1") == "1"
+# Size cap of the memory tier, counted in characters of rendered content
+RENDER_CACHE_MEMORY_BYTES = int(
+    os.environ.get("RENDER_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024))
+)
+RENDER_CACHE_DIR = os.environ.get("RENDER_CACHE_DIR", "")
+
+Source = Union[str, bytes, ContentHandle]
+
+
+def _source_bytes(source: Source) -> Union[bytes, memoryview]:
+    if isinstance(source, ContentHandle):
+        view = source.view()
+        return view if view is not None else b""
+    if isinstance(source, str):
+        return source.encode("utf-8")
+    return source
+
+
+def _source_text(source: Source) -> str:
+    if isinstance(source, ContentHandle):
+        return source.read()
+    if isinstance(source, str):
+        return source
+    return str(source, "utf-8")
+
+
+def make_render_key(
+    source: Source, renderer: str, version: Any, extensions: Sequence[str] = ()
+) -> str:
+    """
+    Build the key of one rendering.
+
+    Args:
+        source (Source): Markdown text, or a handle to a course file
+        renderer (str): Name of the conversion, e.g. "markdown"
+        version (Any): Version of the conversion, bumped when its output changes
+        extensions (Sequence[str]): Extensions the conversion runs with
+
+    Returns:
+        str: Hex digest identifying the rendering
+    """
+    digest = hashlib.sha256()
+    for part in (
+        renderer.encode("utf-8"),
+        str(version).encode("utf-8"),
+        "\0".join(extensions).encode("utf-8"),
+        _source_bytes(source),
+    ):
+        # Length-prefix each part so the boundaries are unambiguous
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Size-bounded in-memory LRU of rendered markdown with an optional disk tier."""
+
+    def __init__(
+        self,
+        memory_bytes: int = RENDER_CACHE_MEMORY_BYTES,
+        disk_dir: Optional[Path] = Path(RENDER_CACHE_DIR) if RENDER_CACHE_DIR else None,
+    ):
+        self.memory_bytes = max(1, memory_bytes)
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_usage = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.conversions = 0
+        self.conversion_seconds = 0.0
+
+        if self.disk_dir:
+            try:
+                self.disk_dir.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                print(f"Render cache disk tier disabled: {str(e)}")
+                self.disk_dir = None
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.md"
+
+    def _remember(self, key: str, rendered: str):
+        """Insert into the memory tier, evicting the least recently used."""
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_usage -= len(previous)
+        self._memory[key] = rendered
+        self._memory_usage += len(rendered)
+        while self._memory_usage > self.memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_usage -= len(evicted)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a rendering.
+
+        Args:
+            key (str): Key from make_render_key
+
+        Returns:
+            Optional[str]: Rendered content if cached, None otherwise
+        """
+        with self._lock:
+            rendered = self._memory.get(key)
+            if rendered is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return rendered
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                    rendered = f.read()
+            except OSError:
+                rendered = None
+
+        with self._lock:
+            if rendered is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, rendered)
+            return rendered
+
+    def put(self, key: str, rendered: str):
+        """
+        Store a rendering.
+
+        Args:
+            key (str): Key from make_render_key
+            rendered (str): Rendered content
+        """
+        with self._lock:
+            self._remember(key, rendered)
+
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            # Write then rename so readers never see a partial entry
+            temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(rendered)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error writing render cache entry: {str(e)}")
+
+    def render(
+        self,
+        source: Source,
+        convert: Callable[[str], str],
+        renderer: str,
+        version: Any,
+        extensions: Sequence[str] = (),
+    ) -> str:
+        """
+        Get the rendering of a source, converting it on a miss.
+
+        Args:
+            source (Source): Markdown text, or a handle to a course file
+            convert (Callable[[str], str]): Conversion of the markdown text
+            renderer (str): Name of the conversion, part of the key
+            version (Any): Version of the conversion, part of the key
+            extensions (Sequence[str]): Extensions used, part of the key
+
+        Returns:
+            str: Rendered content
+        """
+        if isinstance(source, ContentHandle):
+            # Read a course file once, for both the key and a conversion
+            source = _source_bytes(source)
+
+        key = make_render_key(source, renderer, version, extensions)
+        rendered = self.get(key)
+        if rendered is not None:
+            return rendered
+
+        started = time.perf_counter()
+        rendered = convert(_source_text(source))
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.conversions += 1
+            self.conversion_seconds += elapsed
+        self.put(key, rendered)
+        return rendered
+
+    def clear(self):
+        """Drop every rendering from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_usage = 0
+        if self.disk_dir:
+            for entry in self.disk_dir.glob("*.md"):
+                try:
+                    entry.unlink()
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dict[str, Any]: Hits per tier, misses, hit rate, the number and
+            total and mean duration of conversions, and memory usage
+        """
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "conversions": self.conversions,
+                "conversion_ms": self.conversion_seconds * 1000,
+                "mean_conversion_ms": (
+                    self.conversion_seconds * 1000 / self.conversions
+                    if self.conversions
+                    else 0.0
+                ),
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_usage,
+                "evictions": self.evictions,
+            }
+
+
+_cache: Optional[RenderCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> Optional[RenderCache]:
+    """
+    Get the process-wide render cache.
+
+    Returns:
+        Optional[RenderCache]: Shared cache, or None if caching is disabled
+    """
+    global _cache
+    if not RENDER_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = RenderCache()
+        return _cache
+
+
+def render_cached(
+    source: Source,
+    convert: Callable[[str], str],
+    renderer: str,
+    version: Any,
+    extensions: Sequence[str] = (),
+) -> str:
+    """
+    Render through the shared cache, or directly if caching is disabled.
+
+    Args:
+        source (Source): Markdown text, or a handle to a course file
+        convert (Callable[[str], str]): Conversion of the markdown text
+        renderer (str): Name of the conversion, part of the key
+        version (Any): Version of the conversion, part of the key
+        extensions (Sequence[str]): Extensions used, part of the key
+
+    Returns:
+        str: Rendered content
+    """
+    cache = get_render_cache()
+    if cache is None:
+        return convert(_source_text(source))
+    return cache.render(source, convert, renderer, version, extensions)
@@ -0,0 +1,236 @@
+"""
+SQLite storage backend for single-node deployments, offline use and tests.
+
+Accounts and progress live in one local database file in WAL mode, so page
+reads never wait on a writer and no request leaves the machine. Passwords
+are stored as salted PBKDF2 hashes. Select it with STORAGE_BACKEND=sqlite.
+"""
+
+import hashlib
+import hmac
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.storage import PROGRESS_FIELDS, StorageBackend
+
+# PBKDF2-SHA256 iterations for new password hashes
+PASSWORD_HASH_ITERATIONS = int(os.environ.get("PASSWORD_HASH_ITERATIONS", "200000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    uid TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    display_name TEXT,
+    password_hash TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_email ON users (email COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS progress (
+    uid TEXT NOT NULL REFERENCES users (uid) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (uid, kind, item_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS progress_completed
+    ON progress (uid, completed_at, kind, item_id);
+"""
+
+
+def hash_password(password: str, iterations: int = PASSWORD_HASH_ITERATIONS) -> str:
+    """
+    Hash a password for storage.
+
+    Returns:
+        str: "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>"
+    """
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${digest.hex()}"
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """Check a password against a hash from hash_password."""
+    try:
+        algorithm, iterations, salt, expected = stored.split("$")
+    except ValueError:
+        return False
+    if algorithm != "pbkdf2_sha256":
+        return False
+    digest = hashlib.pbkdf2_hmac(
+        "sha256", password.encode("utf-8"), bytes.fromhex(salt), int(iterations)
+    )
+    return hmac.compare_digest(digest.hex(), expected)
+
+
+class SQLiteStorage(StorageBackend):
+    """Storage backend on a local SQLite database."""
+
+    name = "sqlite"
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        # One connection per thread; Streamlit runs each session in its own
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA foreign_keys = ON")
+            # WAL is durable across commits at NORMAL, and much faster
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def initialize(self) -> bool:
+        if self._initialized:
+            return True
+        with self._init_lock:
+            if self._initialized:
+                return True
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                connection = self._connect()
+                # Persistent for the database file, readers never block on a writer
+                connection.execute("PRAGMA journal_mode = WAL")
+                connection.executescript(SCHEMA)
+                connection.commit()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Error initializing SQLite storage at {self.path}: {e}")
+                return False
+            self._initialized = True
+        return True
+
+    def _user_data(self, connection: sqlite3.Connection, row) -> Dict[str, Any]:
+        user_data = {
+            "uid": row["uid"],
+            "email": row["email"],
+            "displayName": row["display_name"],
+            "createdAt": row["created_at"],
+        }
+        for field in PROGRESS_FIELDS.values():
+            user_data[field] = []
+        for kind, item_id in connection.execute(
+            "SELECT kind, item_id FROM progress WHERE uid = ? "
+            "ORDER BY completed_at, item_id",
+            (row["uid"],),
+        ):
+            if kind in PROGRESS_FIELDS:
+                user_data[PROGRESS_FIELDS[kind]].append(item_id)
+        return user_data
+
+    def create_user(
+        self, email: str, password: str, display_name: str
+    ) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        if not self.initialize():
+            return False, "Storage initialization failed", None
+
+        uid = uuid.uuid4().hex
+        try:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT INTO users (uid, email, display_name, password_hash, "
+                    "created_at) VALUES (?, ?, ?, ?, ?)",
+                    (uid, email, display_name, hash_password(password), time.time()),
+                )
+        except sqlite3.IntegrityError:
+            return False, "Email already exists", None
+        except sqlite3.Error as e:
+            return False, f"Error creating user: {str(e)}", None
+
+        user_data = {"uid": uid, "email": email, "displayName": display_name}
+        return True, "User created successfully", user_data
+
+    def authenticate_user(
+        self, email: str, password: str
+    ) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        if not self.initialize():
+            return False, "Storage initialization failed", None
+
+        try:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT * FROM users WHERE email = ? COLLATE NOCASE", (email,)
+            ).fetchone()
+            if row is None:
+                return False, "Email not found", None
+            if not verify_password(password, row["password_hash"]):
+                return False, "Invalid password", None
+
+            user_data = self._user_data(connection, row)
+        except sqlite3.Error as e:
+            return False, f"Authentication error: {str(e)}", None
+
+        if not user_data["displayName"]:
+            user_data["displayName"] = email.split("@")[0]
+        return True, "Authentication successful", user_data
+
+    def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        if not self.initialize():
+            return None
+
+        try:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT * FROM users WHERE uid = ?", (user_id,)
+            ).fetchone()
+            return self._user_data(connection, row) if row is not None else None
+        except sqlite3.Error as e:
+            print(f"Error getting user: {str(e)}")
+            return None
+
+    def mark_completed_many(self, completions: List[Tuple[str, str, str]]) -> bool:
+        if not completions:
+            return True
+        if not self.initialize():
+            return False
+
+        now = time.time()
+        try:
+            connection = self._connect()
+            with connection:
+                user_ids = {user_id for user_id, _, _ in completions}
+                known = set()
+                ordered = sorted(user_ids)
+                # Stay under SQLite's limit on query parameters
+                for start in range(0, len(ordered), 500):
+                    chunk = ordered[start : start + 500]
+                    known.update(
+                        row["uid"]
+                        for row in connection.execute(
+                            "SELECT uid FROM users WHERE uid IN "
+                            f"({', '.join('?' * len(chunk))})",
+                            chunk,
+                        )
+                    )
+                # Like the Firestore backend, skip users that do not exist
+                if known != user_ids:
+                    print(
+                        "Skipping completions of users that do not exist: "
+                        f"{sorted(user_ids - known)}"
+                    )
+                # Keeps the first completion time of items already recorded;
+                # the offsets keep the batch's completions in order
+                connection.executemany(
+                    "INSERT OR IGNORE INTO progress (uid, kind, item_id, "
+                    "completed_at) VALUES (?, ?, ?, ?)",
+                    [
+                        (user_id, kind, item_id, now + index * 1e-6)
+                        for index, (user_id, kind, item_id) in enumerate(completions)
+                        if kind in PROGRESS_FIELDS and user_id in known
+                    ],
+                )
+            return True
+        except sqlite3.Error as e:
+            print(f"Error recording completions: {str(e)}")
+            return False
@@ -0,0 +1,208 @@
+"""
+Storage of user accounts and progress.
+
+Pages and utilities call the functions of this module, which delegate to the
+backend selected by STORAGE_BACKEND:
+
+    firebase  Firebase Auth and Firestore (utils/firebase.py), the default
+    sqlite    a local SQLite database (utils/sqlite_storage.py), for
+              single-node deployments, offline use and load tests
+
+Backends are imported on first use, so the SQLite backend runs without the
+Firebase SDK installed.
+"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# "firebase" or "sqlite"
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "firebase")
+# Database file of the SQLite backend
+STORAGE_SQLITE_PATH = Path(
+    os.environ.get(
+        "STORAGE_SQLITE_PATH",
+        str(Path(__file__).parent.parent.parent / "storage" / "pycamp.sqlite3"),
+    )
+)
+
+# User data field listing the completed items of each kind
+PROGRESS_FIELDS = {"module": "completedModules", "exercise": "completedExercises"}
+
+# (user ID, kind, item ID), kind being a key of PROGRESS_FIELDS
+Completion = Tuple[str, str, str]
+
+
+class StorageBackend(ABC):
+    """
+    Interface of a user and progress store.
+
+    Return values follow the Firebase functions the interface was taken
+    from: (success, message, data) tuples for account operations, user data
+    dicts with "uid", "email", "displayName" and the PROGRESS_FIELDS lists,
+    and booleans for progress writes.
+    """
+
+    name = "abstract"
+
+    def initialize(self) -> bool:
+        """Prepare the backend; whether it is ready to use."""
+        return True
+
+    @abstractmethod
+    def create_user(
+        self, email: str, password: str, display_name: str
+    ) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """Create an account, see create_user."""
+
+    @abstractmethod
+    def authenticate_user(
+        self, email: str, password: str
+    ) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """Check a user's credentials, see authenticate_user."""
+
+    @abstractmethod
+    def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Load a user's data, see get_user_by_id."""
+
+    @abstractmethod
+    def mark_completed_many(self, completions: List[Completion]) -> bool:
+        """
+        Record completions of one or more users.
+
+        Completions of users that do not exist are skipped and logged, so
+        they cannot fail the others. False means the write failed and can
+        be retried.
+        """
+
+    def mark_completed(self, user_id: str, kind: str, item_id: str) -> bool:
+        return self.mark_completed_many([(user_id, kind, item_id)])
+
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+    """
+    Get the process-wide storage backend.
+
+    Returns:
+        StorageBackend: Backend selected by STORAGE_BACKEND
+    """
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_BACKEND == "sqlite":
+                from utils.sqlite_storage import SQLiteStorage
+
+                _storage = SQLiteStorage(STORAGE_SQLITE_PATH)
+            elif STORAGE_BACKEND == "firebase":
+                from utils.firebase import FirebaseStorage
+
+                _storage = FirebaseStorage()
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+        return _storage
+
+
+def initialize_storage() -> bool:
+    """Prepare the storage backend; whether it is ready to use."""
+    return get_storage().initialize()
+
+
+def create_user(
+    email: str, password: str, display_name: str
+) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+    """
+    Create a new user.
+
+    Args:
+        email (str): User email
+        password (str): User password
+        display_name (str): User display name
+
+    Returns:
+        Tuple[bool, str, Optional[Dict]]:
+            - Success status (bool)
+            - Message (str)
+            - User data if created successfully, None otherwise
+    """
+    return get_storage().create_user(email, password, display_name)
+
+
+def authenticate_user(
+    email: str, password: str
+) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+    """
+    Authenticate a user with email and password.
+
+    Args:
+        email (str): User email
+        password (str): User password
+
+    Returns:
+        Tuple[bool, str, Optional[Dict]]:
+            - Success status (bool)
+            - Message (str)
+            - User data if authenticated successfully, None otherwise
+    """
+    return get_storage().authenticate_user(email, password)
+
+
+def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get a user by ID.
+
+    Args:
+        user_id (str): User ID
+
+    Returns:
+        Optional[Dict]: User data if found, None otherwise
+    """
+    return get_storage().get_user_by_id(user_id)
+
+
+def mark_module_completed(user_id: str, module_id: str) -> bool:
+    """
+    Mark a module as completed for a user.
+
+    Args:
+        user_id (str): User ID
+        module_id (str): Module ID
+
+    Returns:
+        bool: Success status
+    """
+    return get_storage().mark_completed(user_id, "module", module_id)
+
+
+def mark_exercise_completed(user_id: str, exercise_id: str) -> bool:
+    """
+    Mark an exercise as completed for a user.
+
+    Args:
+        user_id (str): User ID
+        exercise_id (str): Exercise ID
+
+    Returns:
+        bool: Success status
+    """
+    return get_storage().mark_completed(user_id, "exercise", exercise_id)
+
+
+def mark_completed_many(completions: List[Completion]) -> bool:
+    """
+    Record several completions, of one or more users, in one commit.
+
+    Args:
+        completions (List[Completion]): (user ID, kind, item ID) tuples,
+            kind being "module" or "exercise"
+
+    Returns:
+        bool: Success status; completions of users that do not exist are
+        skipped rather than failing the others
+    """
+    return get_storage().mark_completed_many(completions)
@@ -0,0 +1,176 @@
+"""
+Process-wide cache of user profiles.
+
+With the Firebase backend, get_user_by_id costs two remote calls (Firebase
+Auth get_user and a Firestore document read), and pages used to make them on every rerun.
+Profiles are now kept for USER_CACHE_TTL seconds and dropped as soon as the
+app itself changes them: on login, logout and when progress is written.
+Pages read profiles through get_user_profile.
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from utils.storage import get_user_by_id
+
+# Seconds a profile is served from the cache
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "60"))
+# Maximum number of cached profiles
+USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", "1024"))
+
+# Remote calls made by one get_user_by_id
+REMOTE_READS_PER_LOAD = 2
+
+
+class UserProfileCache:
+    """LRU of user profiles with a TTL and explicit invalidation."""
+
+    def __init__(
+        self,
+        ttl: float = USER_CACHE_TTL,
+        max_entries: int = USER_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        # user ID -> (expiry on the monotonic clock, profile)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Loads running per user, and a counter bumped when such a user is
+        # invalidated, so a load that raced with it is not stored. Both only
+        # hold users with a load in flight
+        self._loading: Dict[str, int] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0}
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a user's profile, loading it if it is not cached or too old.
+
+        Args:
+            user_id (str): User ID
+
+        Returns:
+            Optional[Dict[str, Any]]: A copy of the profile, None if the user
+            does not exist or could not be loaded
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached is not None:
+                if cached[0] > now:
+                    self._entries.move_to_end(user_id)
+                    self._stats["hits"] += 1
+                    return copy.deepcopy(cached[1])
+                del self._entries[user_id]
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            self._loading[user_id] = self._loading.get(user_id, 0) + 1
+            generation = self._generations.get(user_id, 0)
+
+        profile = None
+        try:
+            profile = get_user_by_id(user_id)
+        finally:
+            with self._lock:
+                # Not cached if it failed, so it is retried on the next call
+                if (
+                    profile is not None
+                    and self._generations.get(user_id, 0) == generation
+                ):
+                    self._entries[user_id] = (now + self.ttl, copy.deepcopy(profile))
+                    self._entries.move_to_end(user_id)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                self._loading[user_id] -= 1
+                if not self._loading[user_id]:
+                    del self._loading[user_id]
+                    self._generations.pop(user_id, None)
+        return profile
+
+    def invalidate(self, user_id: str):
+        """
+        Drop a user's profile, e.g. after writing to it.
+
+        Args:
+            user_id (str): User ID
+        """
+        with self._lock:
+            if user_id in self._loading:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            if self._entries.pop(user_id, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def clear(self):
+        """Drop every cached profile."""
+        with self._lock:
+            for user_id in self._loading:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dict[str, Any]: Hits, misses, expired and invalidated entries,
+            hit rate, remote reads avoided by hits, and cached profiles
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return dict(
+                self._stats,
+                hit_rate=self._stats["hits"] / lookups if lookups else 0.0,
+                remote_reads_avoided=self._stats["hits"] * REMOTE_READS_PER_LOAD,
+                entries=len(self._entries),
+            )
+
+
+_cache: Optional[UserProfileCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_user_cache() -> UserProfileCache:
+    """
+    Get the process-wide user profile cache.
+
+    Returns:
+        UserProfileCache: Cache shared by all sessions
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = UserProfileCache()
+        return _cache
+
+
+def get_user_profile(user_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Get a user's profile for display, including progress not written yet.
+
+    Args:
+        user_id (Optional[str]): User ID, None if nobody is logged in
+
+    Returns:
+        Optional[Dict[str, Any]]: Profile, None if it could not be loaded
+    """
+    if user_id is None:
+        return None
+    # Imported here, the progress queue itself invalidates this cache
+    from utils.progress_queue import apply_progress_overlay
+
+    return apply_progress_overlay(get_user_cache().get(user_id))
+
+
+def invalidate_user(user_id: Optional[str]):
+    """
+    Drop a user's cached profile after the app changed it.
+
+    Args:
+        user_id (Optional[str]): User ID, ignored if None
+    """
+    if user_id is not None:
+        get_user_cache().invalidate(user_id)
@@ -0,0 +1,426 @@
+"""
+Grading throughput and latency benchmark.
+
+Drives exercise_runner.test_exercise with every bundled exercise's starter
+code, plus the example solutions at the repository root for the exercise
+they solve, in each grading mode and at each concurrency level. Every job
+gets a unique submission, so neither the result cache nor in-flight
+deduplication hides real grading work.
+
+Reports p50/p95/p99 latency, throughput, CPU seconds (this process, the
+pool workers / fork server and everything they started) and peak RSS, and
+can write the numbers as JSON and compare them with an earlier run. Peak
+RSS is a high-water mark since the benchmark started, so run one mode per
+invocation when comparing memory:
+
+    python tools/benchmark_grading.py --concurrency 1 4 8 --json bench.json
+    python tools/benchmark_grading.py --compare bench.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "streamlit_app"))
+
+# Every job must execute, not come from the cache
+os.environ["GRADING_CACHE_ENABLED"] = "0"
+
+from utils import exercise_runner
+from utils.course_loader import EXERCISES_DIR
+from utils.grading_pool import get_fork_server, get_worker_pool
+
+# "inline" grades through the exercise "runner": "inline" fast path, for
+# the submissions whose limits the inline runner can enforce
+MODES = ["subprocess", "pool", "forkserver", "inline"]
+
+# Example submissions kept at the repository root, by exercise
+ROOT_SUBMISSIONS = {"string_reversal": ["solution.py", "bad_solution.py"]}
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+Job = Tuple[str, bytes, bytes, Optional[Dict[str, Any]]]
+
+
+def load_jobs() -> List[Job]:
+    """
+    Collect (label, submission, test, limits) tuples for the bundled exercises.
+    """
+    jobs = []
+    for exercise_dir in sorted(EXERCISES_DIR.iterdir()):
+        test_file = exercise_dir / "test.py"
+        if not test_file.exists():
+            continue
+        test_content = test_file.read_bytes()
+
+        limits = None
+        metadata_file = exercise_dir / "metadata.json"
+        if metadata_file.exists():
+            limits = json.loads(metadata_file.read_text(encoding="utf-8")).get("limits")
+
+        submissions = [exercise_dir / "starter_code.py"] + [
+            PROJECT_ROOT / name for name in ROOT_SUBMISSIONS.get(exercise_dir.name, [])
+        ]
+        for submission in submissions:
+            if submission.exists():
+                jobs.append(
+                    (
+                        f"{exercise_dir.name}/{submission.name}",
+                        submission.read_bytes(),
+                        test_content,
+                        limits,
+                    )
+                )
+    return jobs
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+def _proc_stat(pid: int) -> Tuple[float, float]:
+    """
+    Get (CPU seconds including reaped children, peak RSS in MB) of a process.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            # Fields after the parenthesised command name
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = sum(int(value) for value in fields[11:15]) / CLOCK_TICKS
+
+        peak = 0.0
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) / 1024
+        return cpu, peak
+    except (OSError, IndexError, ValueError):
+        return 0.0, 0.0
+
+
+def _helper_pids(mode: str) -> List[int]:
+    if mode == "pool":
+        return get_worker_pool().pids()
+    if mode == "forkserver":
+        return get_fork_server().pids()
+    return []
+
+
+def _usage_snapshot(mode: str) -> Dict[str, float]:
+    """CPU seconds used so far by this process and every grading process."""
+    cpu = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        cpu += usage.ru_utime + usage.ru_stime
+    helpers = {pid: _proc_stat(pid) for pid in _helper_pids(mode)}
+    return {"cpu": cpu, "helpers": helpers}
+
+
+def _cpu_used(before: Dict[str, Any], after: Dict[str, Any]) -> float:
+    used = after["cpu"] - before["cpu"]
+    for pid, (cpu, _) in after["helpers"].items():
+        # A helper that was replaced mid-run is counted from zero
+        used += cpu - before["helpers"].get(pid, (0.0, 0.0))[0]
+    return used
+
+
+def _peak_rss_mb(mode: str) -> Dict[str, float]:
+    """Peak RSS of this process and of the largest grading process."""
+    # ru_maxrss is in kilobytes on Linux
+    server = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    graders = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    for pid in _helper_pids(mode):
+        graders = max(graders, _proc_stat(pid)[1])
+    return {"server": round(server, 1), "grader": round(graders, 1)}
+
+
+def inline_jobs(jobs: List[Job]) -> Tuple[List[Job], List[str]]:
+    """
+    Split jobs into those test_exercise grades inline and those it does not.
+
+    Returns:
+        Tuple[List[Job], List[str]]: Inline-eligible jobs, labels of the rest
+    """
+    eligible, skipped = [], []
+    for job in jobs:
+        if set(job[3] or {}) <= exercise_runner.INLINE_LIMITS:
+            eligible.append(job)
+        else:
+            skipped.append(job[0])
+    return eligible, skipped
+
+
+# Submissions the inline runner really graded, so that runs which fell back
+# to GRADING_MODE (e.g. because the inline runner was busy) show up
+_inline_gradings: List[int] = []
+_validate_exercise_inline = exercise_runner.validate_exercise_inline
+
+
+def _count_inline_grading(*args, **kwargs):
+    result = _validate_exercise_inline(*args, **kwargs)
+    _inline_gradings.append(1)
+    return result
+
+
+exercise_runner.validate_exercise_inline = _count_inline_grading
+
+
+def benchmark(
+    mode: str, concurrency: int, jobs: List[Job], runs: int
+) -> Optional[Dict]:
+    """
+    Grade every job `runs` times with `concurrency` callers in one mode.
+
+    Returns:
+        Optional[Dict]: Latency percentiles, throughput, CPU and memory for
+        the run, None if there is nothing to grade in this mode
+    """
+    runner = None
+    if mode == "inline":
+        if not exercise_runner.GRADING_INLINE_ENABLED:
+            print("Skipping inline: GRADING_INLINE_ENABLED is off")
+            return None
+        jobs, skipped = inline_jobs(jobs)
+        if skipped:
+            print(
+                f"Skipping inline for {', '.join(skipped)}: limits other than "
+                f"{', '.join(sorted(exercise_runner.INLINE_LIMITS))} are set"
+            )
+        if not jobs:
+            return None
+        runner = "inline"
+        # Only used if a submission falls back, which is reported below
+        exercise_runner.GRADING_MODE = "subprocess"
+    else:
+        exercise_runner.GRADING_MODE = mode
+
+    # Start the pool or fork server outside the measured window
+    label, submission, test_content, limits = jobs[0]
+    started = time.perf_counter()
+    exercise_runner.test_exercise(
+        submission + f"\n# warm-up {time.time()}\n".encode(),
+        test_content,
+        limits,
+        runner,
+    )
+    first = time.perf_counter() - started
+
+    work = [
+        (label, submission + f"\n# {mode} c{concurrency} run {run}\n".encode())
+        + (test_content, limits)
+        for run in range(runs)
+        for label, submission, test_content, limits in jobs
+    ]
+
+    def grade(job):
+        label, submission, test_content, limits = job
+        job_started = time.perf_counter()
+        result = exercise_runner.test_exercise(submission, test_content, limits, runner)
+        return label, result.status, time.perf_counter() - job_started
+
+    del _inline_gradings[:]
+    before = _usage_snapshot(mode)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(grade, work))
+    wall = time.perf_counter() - started
+    after = _usage_snapshot(mode)
+
+    latencies = sorted(latency for _, _, latency in outcomes)
+    statuses: Dict[str, Dict[str, int]] = {}
+    for label, status, _ in outcomes:
+        counts = statuses.setdefault(label, {})
+        counts[status] = counts.get(status, 0) + 1
+
+    cpu = _cpu_used(before, after)
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "jobs": len(outcomes),
+        "wall_seconds": round(wall, 3),
+        "throughput": round(len(outcomes) / wall, 2) if wall else 0.0,
+        "first_job_ms": round(first * 1000, 1),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 1),
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1),
+        },
+        "cpu_seconds": round(cpu, 3),
+        "cpu_ms_per_job": round(cpu / len(outcomes) * 1000, 1),
+        "peak_rss_mb": _peak_rss_mb(mode),
+        "statuses": statuses,
+        "graded_inline": len(_inline_gradings) if runner == "inline" else 0,
+    }
+
+
+def print_table(results: List[Dict]):
+    print(
+        f"{'mode':<12}{'conc':>5}{'jobs/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+        f"{'cpu/job':>10}{'rss MB':>9}"
+    )
+    for result in results:
+        latency = result["latency_ms"]
+        # Inline grading happens in this process, the others in graders
+        rss = result["peak_rss_mb"][
+            "server" if result["mode"] == "inline" else "grader"
+        ]
+        print(
+            f"{result['mode']:<12}{result['concurrency']:>5}"
+            f"{result['throughput']:>9.1f}{latency['p50']:>9.1f}"
+            f"{latency['p95']:>9.1f}{latency['p99']:>9.1f}"
+            f"{result['cpu_ms_per_job']:>10.1f}"
+            f"{rss:>9.1f}"
+        )
+
+
+def check_statuses(results: List[Dict]) -> List[str]:
+    """Every mode and concurrency must grade each submission the same way."""
+    problems = []
+    expected: Dict[str, str] = {}
+    for result in results:
+        for label, counts in result["statuses"].items():
+            if len(counts) > 1:
+                problems.append(
+                    f"{label} graded inconsistently in {result['mode']} "
+                    f"at concurrency {result['concurrency']}: {counts}"
+                )
+            status = next(iter(counts))
+            if expected.setdefault(label, status) != status:
+                problems.append(
+                    f"{label} is {status} in {result['mode']}, "
+                    f"expected {expected[label]}"
+                )
+    return problems
+
+
+def check_inline(results: List[Dict]) -> List[str]:
+    """Every job of an inline run must have been graded inline."""
+    return [
+        f"inline at concurrency {result['concurrency']}: only "
+        f"{result['graded_inline']} of {result['jobs']} jobs were graded "
+        f"inline, the rest fell back to GRADING_MODE"
+        for result in results
+        if result["mode"] == "inline" and result["graded_inline"] != result["jobs"]
+    ]
+
+
+def compare(results: List[Dict], baseline_file: str, threshold: float) -> List[str]:
+    """
+    Compare results with an earlier JSON report.
+
+    Returns:
+        List[str]: Regressions worse than `threshold` percent
+    """
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = {
+            (result["mode"], result["concurrency"]): result
+            for result in json.load(f)["results"]
+        }
+
+    regressions = []
+    print(f"\nChange against {baseline_file}:")
+    for result in results:
+        key = (result["mode"], result["concurrency"])
+        if key not in baseline:
+            continue
+        old = baseline[key]
+        changes = {
+            "throughput": (old["throughput"], result["throughput"], True),
+            "p95": (old["latency_ms"]["p95"], result["latency_ms"]["p95"], False),
+            "cpu/job": (old["cpu_ms_per_job"], result["cpu_ms_per_job"], False),
+        }
+        line = []
+        for name, (before, after, higher_is_better) in changes.items():
+            if not before:
+                continue
+            change = (after - before) / before * 100
+            line.append(f"{name} {change:+.1f}%")
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append(
+                    f"{key[0]} at concurrency {key[1]}: {name} " f"{before} -> {after}"
+                )
+        print(f"  {key[0]:<12}{key[1]:>5}  " + ", ".join(line))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Runs per submission")
+    parser.add_argument(
+        "--modes", nargs="+", default=MODES, choices=MODES, help="Modes to run"
+    )
+    parser.add_argument(
+        "--concurrency",
+        nargs="+",
+        type=int,
+        default=[1, 4],
+        help="Number of concurrent callers, one benchmark per value",
+    )
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare with an earlier JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=20.0,
+        help="Percent change counted as a regression by --compare",
+    )
+    args = parser.parse_args()
+
+    jobs = load_jobs()
+    if not jobs:
+        print(f"No exercises found in {EXERCISES_DIR}")
+        return 1
+    print(
+        f"Grading {len(jobs)} submissions x {args.runs} runs "
+        f"per mode and concurrency\n"
+    )
+
+    results = []
+    for mode in args.modes:
+        for concurrency in args.concurrency:
+            result = benchmark(mode, concurrency, jobs, args.runs)
+            if result is not None:
+                results.append(result)
+    print_table(results)
+
+    report = {
+        "runner_version": exercise_runner.RUNNER_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "runs": args.runs,
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+    problems = check_statuses(results) + check_inline(results)
+    if args.compare:
+        problems += compare(results, args.compare, args.threshold)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
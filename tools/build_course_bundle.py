@@ -0,0 +1,51 @@
+"""
+Compile the course/ tree into a single bundle file for deployment.
+
+    python tools/build_course_bundle.py [--course course] [--output course.bundle]
+
+The app serves all course content from the bundle when it exists (see
+COURSE_BUNDLE and COURSE_SOURCE in streamlit_app/utils/course_loader.py).
+Rebuild it whenever the course changes; the file is replaced atomically.
+
+With RENDER_CACHE_DIR set, the code blocks of the course are also
+syntax-highlighted into that directory, so the app does not lex them.
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Add the Streamlit app to the Python path
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "streamlit_app"))
+)
+
+from utils.course_loader import COURSE_BUNDLE, COURSE_DIR
+from utils.course_bundle import build_bundle
+from utils.code_highlight import precompute_highlighting
+from utils.render_cache import get_render_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--course", type=Path, default=COURSE_DIR)
+    parser.add_argument("--output", type=Path, default=COURSE_BUNDLE)
+    args = parser.parse_args()
+
+    header = build_bundle(args.course, args.output)
+    size = args.output.stat().st_size
+    print(
+        f"Wrote {args.output} ({size} bytes): {len(header['modules'])} modules, "
+        f"{len(header['exercises'])} exercises, {len(header['files'])} files"
+    )
+    print(f"Content hash {header['contentHash']}")
+
+    cache = get_render_cache()
+    if cache is not None and cache.disk_dir:
+        blocks = precompute_highlighting(args.course)
+        print(f"Highlighted {blocks} code blocks into {cache.disk_dir}")
+
+
+if __name__ == "__main__":
+    main()